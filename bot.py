@@ -1,11 +1,10 @@
 import asyncio
 import logging
-import random
-import string
 from datetime import datetime, timedelta, time, date
 from aiogram import Bot, Dispatcher, F
+from aiogram.exceptions import TelegramBadRequest
 from aiogram.filters import Command
-from aiogram.types import Message, CallbackQuery, FSInputFile
+from aiogram.types import Message, CallbackQuery, BufferedInputFile, InputMediaPhoto
 from aiogram.fsm.context import FSMContext
 from aiogram.fsm.state import State, StatesGroup
 from aiogram.utils.keyboard import InlineKeyboardBuilder
@@ -14,7 +13,7 @@ from apscheduler.triggers.cron import CronTrigger
 from pytz import timezone
 
 from config import Config, load_config
-from models import Storage, Cat
+from models import Cat, create_storage
 from keyboards import (
     get_color_keyboard,
     get_main_keyboard,
@@ -24,11 +23,28 @@ from keyboards import (
     get_cancel_message_keyboard
 )
 from image_generator import ImageGenerator
+from render_pool import AsyncRenderer, RenderQueueFull
+from file_id_cache import FileIdCache, file_id_cache_path
+from reminders import ReminderWheel
+from broadcast import BroadcastEngine, broadcasts_path
+from dispatch import OutboundDispatcher
+from rate_limit import TokenBucket
 
 # Настройка логирования
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Тексты напоминаний о прогулке по числу минут до неё
+WALK_REMINDERS = {
+    60: "До прогулки остался 1 час! ⏰",
+    30: "До прогулки осталось 30 минут! ⏰",
+    10: "До прогулки осталось 10 минут! ⏰",
+    0: "Пора гулять! 🚶‍♂️"
+}
+
+# Подпись, когда очередь отрисовки переполнена и картинку статуса показать нельзя
+RENDER_BUSY_TEXT = "Котик прихорашивается, картинка будет чуть позже ⏳"
+
 # Состояния FSM
 class CatStates(StatesGroup):
     waiting_for_name = State()
@@ -40,11 +56,54 @@ class CatStates(StatesGroup):
 class CatBot:
     def __init__(self):
         self.config = load_config()
-        self.storage = Storage()
-        self.image_generator = ImageGenerator()
+        self.storage = create_storage(self.config)
+        load_stats = self.storage.load_stats
+        logger.info(
+            f"Данные загружены за {load_stats['seconds']:.2f} с: котиков {load_stats['cats']}, "
+            f"пиковая память процесса {load_stats['peak_rss_mb']:.1f} МБ"
+        )
+        self.image_generator = ImageGenerator(
+            cache_max_bytes=self.config.render_cache_bytes,
+            png_compress_level=self.config.png_compress_level,
+            png_optimize=self.config.png_optimize,
+            image_format=self.config.image_format,
+            image_quality=self.config.image_quality,
+            image_size=self.config.image_size,
+            title_cache_size=self.config.title_cache_size
+        )
+        self.renderer = AsyncRenderer(
+            self.image_generator,
+            workers=self.config.render_workers,
+            kind=self.config.render_pool,
+            max_pending=self.config.render_max_pending
+        )
+        # file_id уже загруженных картинок хранятся рядом с данными котиков
+        self.file_ids = FileIdCache(
+            file_id_cache_path(self.config.storage_path),
+            self.image_generator.fingerprint(),
+            max_entries=self.config.file_id_cache_size
+        )
         self.bot = Bot(self.config.token)
+        # Общий предел скорости для всех фоновых отправок
+        self.send_bucket = TokenBucket(self.config.broadcast_rate)
+        # Уведомления другим пользователям: параллельно, но по порядку внутри каждого чата
+        self.outbox = OutboundDispatcher(
+            self.bot,
+            concurrency=self.config.dispatch_concurrency,
+            bucket=self.send_bucket
+        )
+        # Рассылки поздравлений с журналом результатов рядом с данными котиков
+        self.broadcasts = BroadcastEngine(
+            self.bot,
+            broadcasts_path(self.config.storage_path),
+            chat_interval=self.config.broadcast_chat_interval,
+            concurrency=self.config.broadcast_concurrency,
+            bucket=self.send_bucket
+        )
         self.dp = Dispatcher()
         self.scheduler = AsyncIOScheduler(timezone=self.config.timezone)
+        # Напоминания о прогулках: по одной записи на котика в колесе таймеров
+        self.reminders = ReminderWheel()
         self.setup_handlers()
         self.setup_scheduler()
 
@@ -81,12 +140,7 @@ class CatBot:
         self.dp.message.register(self.process_main_keyboard, F.text)
 
     def setup_scheduler(self):
-        # Уменьшение характеристик
-        self.scheduler.add_job(
-            self.decrease_stats,
-            'interval',
-            hours=self.config.stats_decrease_hours
-        )
+        # Характеристики уменьшаются лениво при обращении к котику (см. StatDecay)
         
         # Очистка просроченных кодов подключения
         self.scheduler.add_job(
@@ -95,6 +149,13 @@ class CatBot:
             hours=1
         )
         
+        # Сохранение новых file_id картинок
+        self.scheduler.add_job(
+            self.file_ids.flush_async,
+            'interval',
+            minutes=1
+        )
+        
         # Поздравление с днем рождения (26 января)
         self.scheduler.add_job(
             self.send_birthday_greeting,
@@ -119,35 +180,14 @@ class CatBot:
             )
         )
 
-    async def decrease_stats(self):
-        now = datetime.now(timezone(self.config.timezone))
-        
-        # Не уменьшаем характеристики ночью
-        if self.config.night_start <= now.time() <= self.config.night_end:
-            return
-            
-        for cat in self.storage.cats.values():
-            cat.hunger = max(0, cat.hunger - 1)
-            cat.happiness = max(0, cat.happiness - 1)
-            cat.energy = max(0, cat.energy - 1)
-        
-        self.storage.save()
-
     async def cleanup_connection_codes(self):
-        now = datetime.now()
-        expired_codes = [
-            code for code, (_, expires) in self.storage.connection_codes.items()
-            if expires < now
-        ]
-        for code in expired_codes:
-            del self.storage.connection_codes[code]
-        self.storage.save()
+        self.storage.remove_expired_codes(datetime.now())
 
     async def send_birthday_greeting(self):
         """Отправка поздравления хозяйке от котика."""
         # Отправляем поздравление только владельцам (Маше)
-        for cat in self.storage.cats.values():
-            greeting_text = (
+        texts = {
+            cat.owner_id: (
                 f"Сообщение от {cat.name}:\n\n"
                 "Любимая Машенька! 🎉\n"
                 "Поздравляю тебя с днём рождения! 🎂\n"
@@ -157,21 +197,26 @@ class CatBot:
                 "\n\n"
                 "Твой котик 🐱"
             )
-            # Отправляем только владельцу (Маше)
-            await self.bot.send_message(cat.owner_id, greeting_text)
+            for cat in self.storage.cats.values()
+        }
+        summary = await self.broadcasts.run(f"birthday_{date.today().year}", texts, texts=texts)
+        logger.info(f"Поздравление с днём рождения: {summary}")
 
     async def send_new_year_greeting(self):
         """Отправка новогоднего поздравления всем пользователям."""
         greeting_text = "С новым годоооом!!!! ❤️🎄🎅🎁✨"
         
         # Отправляем поздравление всем владельцам и подключенным пользователям
+        recipients = []
         for cat in self.storage.cats.values():
-            # Отправляем владельцу
-            await self.bot.send_message(cat.owner_id, greeting_text)
-            
-            # Отправляем подключенным пользователям
-            for user_id in cat.connected_users:
-                await self.bot.send_message(user_id, greeting_text)
+            recipients.append(cat.owner_id)
+            recipients.extend(cat.connected_users)
+        summary = await self.broadcasts.run(f"new_year_{date.today().year}", recipients, greeting_text)
+        logger.info(f"Новогоднее поздравление: {summary}")
+
+    async def resume_broadcasts(self):
+        for summary in await self.broadcasts.resume_all():
+            logger.info(f"Прерванная рассылка дослана: {summary}")
 
     async def cmd_start(self, message: Message, state: FSMContext):
         user_id = message.from_user.id
@@ -208,14 +253,14 @@ class CatBot:
             color=color
         )
         
-        self.storage.cats[callback.from_user.id] = cat
+        self.storage.add_cat(cat)
         
         # Генерируем код подключения
-        code = ''.join(random.choices(string.ascii_uppercase + string.digits, k=6))
         expires = datetime.now() + timedelta(hours=self.config.connection_code_ttl)
-        self.storage.connection_codes[code] = (callback.from_user.id, expires)
+        code = self.storage.connection_codes.allocate(callback.from_user.id, expires)
         
-        self.storage.save()
+        self.storage.save_cat(callback.from_user.id)
+        self.storage.save_code(code)
         
         # Отправляем приветственное сообщение с кодом
         await self.send_cat_status(
@@ -231,44 +276,140 @@ class CatBot:
         await state.clear()
         await callback.answer()
 
-    async def send_cat_status(self, user_id: int, message_text: str = None, owner_id: int = None):
-        # Если owner_id не указан, значит это владелец котика
-        cat_owner_id = owner_id if owner_id is not None else user_id
-        cat = self.storage.cats[cat_owner_id]
-        
-        image_path = self.image_generator.generate_status_image(
+    def cat_status(self, owner_id: int) -> dict:
+        cat = self.storage.get_cat(owner_id)
+        return dict(
             color=cat.color,
             name=cat.name,
             hunger=cat.hunger,
             happiness=cat.happiness,
             energy=cat.energy,
-            owner_m="",  # Оставляем пустым, так как это не важно для статуса
-            owner_f="",
             age_days=cat.age_days
         )
+
+    async def send_cat_status(self, user_id: int, message_text: str = None, owner_id: int = None):
+        # Если owner_id не указан, значит это владелец котика
+        cat_owner_id = owner_id if owner_id is not None else user_id
+        status = self.cat_status(cat_owner_id)
         
-        await self.bot.send_photo(
+        # Такая картинка уже загружалась - отправляем по file_id без отрисовки и загрузки
+        key = self.image_generator.status_key(**status)
+        file_id = self.file_ids.get(key)
+        if file_id is not None:
+            try:
+                await self.bot.send_photo(
+                    chat_id=user_id,
+                    photo=file_id,
+                    caption=message_text if message_text else None,
+                    reply_markup=get_cat_actions_keyboard()
+                )
+                return
+            except TelegramBadRequest as e:
+                logger.warning(f"Telegram не принял сохранённый file_id, загружаем картинку заново: {e}")
+                self.file_ids.discard(key)
+        
+        try:
+            image = await self.renderer.render_status(**status)
+        except RenderQueueFull as e:
+            logger.warning(f"Картинка статуса не отрисована: {e}")
+            await self.bot.send_message(
+                chat_id=user_id,
+                text=f"{message_text}\n\n{RENDER_BUSY_TEXT}" if message_text else RENDER_BUSY_TEXT,
+                reply_markup=get_cat_actions_keyboard()
+            )
+            return
+        
+        message = await self.bot.send_photo(
             chat_id=user_id,
-            photo=FSInputFile(image_path),
+            photo=BufferedInputFile(image, filename=self.image_generator.filename),
             caption=message_text if message_text else None,
             reply_markup=get_cat_actions_keyboard()
         )
+        if message.photo:
+            self.file_ids.put(key, message.photo[-1].file_id, message.photo[-1].file_unique_id)
+
+    async def edit_cat_status(self, message: Message, user_id: int, message_text: str = None, owner_id: int = None):
+        """Обновляет сообщение со статусом на месте вместо удаления и новой отправки.
+
+        message_text=None оставляет текущую подпись. Если картинка и подпись
+        не изменились, запрос в Telegram не отправляется вовсе. Если сообщение
+        отредактировать не удалось, оно удаляется и статус отправляется заново.
+        """
+        cat_owner_id = owner_id if owner_id is not None else user_id
+        status = self.cat_status(cat_owner_id)
+        key = self.image_generator.status_key(**status)
+        caption = message_text if message_text is not None else message.caption
+        
+        if not message.photo:
+            await self.resend_cat_status(message, user_id, message_text, owner_id)
+            return
+        
+        # file_id одного файла может отличаться, а file_unique_id - нет
+        file_id = self.file_ids.get(key)
+        try:
+            if file_id is not None and self.file_ids.unique_id(key) == message.photo[-1].file_unique_id:
+                # Картинка та же: меняем только подпись, если она изменилась
+                if caption != message.caption:
+                    await self.bot.edit_message_caption(
+                        chat_id=message.chat.id,
+                        message_id=message.message_id,
+                        caption=caption,
+                        reply_markup=get_cat_actions_keyboard()
+                    )
+                return
+            
+            if file_id is not None:
+                photo = file_id
+            else:
+                image = await self.renderer.render_status(**status)
+                photo = BufferedInputFile(image, filename=self.image_generator.filename)
+            edited = await self.bot.edit_message_media(
+                media=InputMediaPhoto(media=photo, caption=caption),
+                chat_id=message.chat.id,
+                message_id=message.message_id,
+                reply_markup=get_cat_actions_keyboard()
+            )
+            if isinstance(edited, Message) and edited.photo:
+                # file_id мог смениться, поэтому запоминаем его и file_unique_id заново
+                self.file_ids.put(key, edited.photo[-1].file_id, edited.photo[-1].file_unique_id)
+        except RenderQueueFull as e:
+            # Новую картинку сейчас не нарисовать: оставляем старую и меняем только подпись
+            logger.warning(f"Картинка статуса не отрисована: {e}")
+            try:
+                await self.bot.edit_message_caption(
+                    chat_id=message.chat.id,
+                    message_id=message.message_id,
+                    caption=f"{caption}\n\n{RENDER_BUSY_TEXT}" if caption else RENDER_BUSY_TEXT,
+                    reply_markup=get_cat_actions_keyboard()
+                )
+            except TelegramBadRequest:
+                pass
+        except TelegramBadRequest as e:
+            if 'message is not modified' in str(e):
+                return
+            if file_id is not None:
+                # Сохранённый file_id мог устареть: при повторной отправке картинка загрузится заново
+                self.file_ids.discard(key)
+            logger.warning(f"Не удалось обновить статус на месте, отправляем заново: {e}")
+            await self.resend_cat_status(message, user_id, message_text, owner_id)
+
+    async def resend_cat_status(self, message: Message, user_id: int, message_text: str = None, owner_id: int = None):
+        try:
+            await message.delete()
+        except TelegramBadRequest:
+            pass
+        await self.send_cat_status(user_id, message_text, owner_id)
 
     async def process_cat_action(self, callback: CallbackQuery):
         user_id = callback.from_user.id
         
         # Ищем котика, к которому подключен пользователь
-        owner_id = None
-        for cat_owner_id, cat in self.storage.cats.items():
-            if user_id == cat_owner_id or user_id in cat.connected_users:
-                owner_id = cat_owner_id
-                break
-                
-        if not owner_id:
+        owner_id = self.storage.find_owner(user_id)
+        if owner_id is None:
             await callback.answer("У тебя нет котика! 😿")
             return
             
-        cat = self.storage.cats[owner_id]
+        cat = self.storage.get_cat(owner_id)
         action = callback.data.split('_')[1]
         message_text = None
         is_connected_user = user_id != owner_id
@@ -281,7 +422,7 @@ class CatBot:
                 cat.hunger = min(4, cat.hunger + 1)
                 message_text = "Вы покормили котика! 🍽️"
                 if is_connected_user:
-                    await self.bot.send_message(owner_id, "Стас покормил котика 🍽️")
+                    self.outbox.send_message(owner_id, "Стас покормил котика 🍽️")
                 
             case "play":
                 if cat.energy <= 0:
@@ -291,7 +432,7 @@ class CatBot:
                 cat.energy = max(0, cat.energy - 1)
                 message_text = "Ты поиграла с котиком! 🎾"
                 if is_connected_user:
-                    await self.bot.send_message(owner_id, "Стас поиграл с котиком 🎾")
+                    self.outbox.send_message(owner_id, "Стас поиграл с котиком 🎾")
                 
             case "sleep":
                 if cat.energy >= 4:
@@ -300,18 +441,23 @@ class CatBot:
                 cat.energy = min(4, cat.energy + 2)
                 message_text = "Котик поспал и восстановил энергию! 💤"
                 if is_connected_user:
-                    await self.bot.send_message(owner_id, "Стас уложил котика спать 💤")
+                    self.outbox.send_message(owner_id, "Стас уложил котика спать 💤")
                 
             case "status":
                 pass  # Просто покажем статус без сообщения
         
-        self.storage.save()
-        
-        # Удаляем предыдущее сообщение со статусом
-        await callback.message.delete()
+        if action != "status":
+            self.storage.save_cat(owner_id)
         
-        # Отправляем новое сообщение со статусом
-        await self.send_cat_status(user_id, message_text, owner_id)
+        if self.config.status_edit_in_place:
+            # Обновляем картинку и подпись в том же сообщении
+            await self.edit_cat_status(callback.message, user_id, message_text, owner_id)
+        else:
+            # Удаляем предыдущее сообщение со статусом
+            await callback.message.delete()
+            
+            # Отправляем новое сообщение со статусом
+            await self.send_cat_status(user_id, message_text, owner_id)
         await callback.answer()
 
     async def process_walk_control(self, callback: CallbackQuery, state: FSMContext):
@@ -319,17 +465,12 @@ class CatBot:
         user_id = callback.from_user.id
         
         # Ищем котика, к которому подключен пользователь
-        owner_id = None
-        for cat_owner_id, cat in self.storage.cats.items():
-            if user_id == cat_owner_id or user_id in cat.connected_users:
-                owner_id = cat_owner_id
-                break
-                
-        if not owner_id:
+        owner_id = self.storage.find_owner(user_id)
+        if owner_id is None:
             await callback.answer("У тебя нет котика!")
             return
             
-        cat = self.storage.cats[owner_id]
+        cat = self.storage.get_cat(owner_id)
         is_connected_user = user_id != owner_id
         
         # Обработка быстрого выбора времени
@@ -339,66 +480,23 @@ class CatBot:
             
             # Обновляем время прогулки
             cat.walk_time = time_str
-            self.storage.save()
+            self.storage.save_cat(owner_id)
             
             # Уведомляем владельца о смене времени прогулки
             if is_connected_user:
-                await self.bot.send_message(
+                self.outbox.send_message(
                     owner_id,
                     f"Стас установил время прогулки на {time_str} 🕒"
                 )
             
-            # Настраиваем напоминания
-            walk_id = f"walk_{owner_id}"
-            
-            # Удаляем старые напоминания, если они есть
-            for job in self.scheduler.get_jobs():
-                if job.id.startswith(walk_id):
-                    self.scheduler.remove_job(job.id)
-            
-            # Устанавливаем время для напоминаний
-            walk_datetime = datetime.now().replace(hour=hour, minute=minute, second=0, microsecond=0)
-            if walk_datetime < datetime.now():
-                walk_datetime += timedelta(days=1)
-            
-            # Добавляем напоминания
-            reminders = [
-                (60, "До прогулки остался 1 час! ⏰"),
-                (30, "До прогулки осталось 30 минут! ⏰"),
-                (10, "До прогулки осталось 10 минут! ⏰"),
-                (0, "Пора гулять! 🚶‍♂️")
-            ]
-            
-            for minutes_before, text in reminders:
-                notify_datetime = walk_datetime - timedelta(minutes=minutes_before)
-                
-                # Если время уведомл��ния уже прошло, пропускаем его
-                if notify_datetime <= datetime.now():
-                    continue
-                
-                self.scheduler.add_job(
-                    self.send_walk_notification,
-                    'date',
-                    run_date=notify_datetime,
-                    args=[owner_id, f"{text} {cat.name.capitalize()} ждёт 🐱"],
-                    id=f"{walk_id}_{minutes_before}"
-                )
-                
-                # Отправляем уведомления и подключенным пользователям
-                for connected_user in cat.connected_users:
-                    self.scheduler.add_job(
-                        self.send_walk_notification,
-                        'date',
-                        run_date=notify_datetime,
-                        args=[connected_user, f"{text}"],
-                        id=f"{walk_id}_{minutes_before}_{connected_user}"
-                    )
+            # Настраиваем напоминания (старые, если они были, заменяются)
+            self.schedule_walk(owner_id, hour, minute)
             
             # Отправляем подтверждение и очищаем состояние
             await state.clear()  # Очищаем состояние после установки времени
             await callback.message.edit_text(
                 f"Время прогулки установлено на {time_str}! ⏰\n\n"
-                "Я напомню о прогулке:\n"
+                "Каждый день я напомню о прогулке:\n"
                 "- За 1 час до прогулки 🕐\n"
                 "- За 30 минут до прогулки 🕐\n"
                 "- За 10 минут до прогулки 🕐\n"
@@ -419,14 +517,11 @@ class CatBot:
                     await callback.answer("Время прогулки не установлено!")
                     return
                     
-                # Удаляем задачи уведомлений
-                walk_id = f"walk_{owner_id}"
-                for job in self.scheduler.get_jobs():
-                    if job.id.startswith(walk_id):
-                        self.scheduler.remove_job(job.id)
+                # Удаляем напоминания
+                self.reminders.cancel(owner_id)
                 
                 cat.walk_time = None
-                self.storage.save()
+                self.storage.save_cat(owner_id)
                 await state.clear()
                 await callback.message.delete()
                 await callback.answer("Время п��огулки удалено")
@@ -436,17 +531,12 @@ class CatBot:
         user_id = message.from_user.id
         
         # Ищем котика, к которому подключен пользователь
-        owner_id = None
-        for cat_owner_id, cat in self.storage.cats.items():
-            if user_id == cat_owner_id or user_id in cat.connected_users:
-                owner_id = cat_owner_id
-                break
-                
-        if not owner_id:
+        owner_id = self.storage.find_owner(user_id)
+        if owner_id is None:
             await message.answer("У тебя нет котика! 😿")
             return
             
-        cat = self.storage.cats[owner_id]
+        cat = self.storage.get_cat(owner_id)
         
         if message.text == "Управление котиком":
             await self.send_cat_status(user_id, owner_id=owner_id)
@@ -469,7 +559,7 @@ class CatBot:
             
             # Проверяем, отправлял ли пользователь сообщение сегодня
             now = datetime.now(timezone(self.config.timezone))
-            last_message_date = cat.last_messages.get(user_id)
+            last_message_date = cat.get_last_message(user_id)
             
             if last_message_date:
                 # Преобразуем время последнего сообщения в часовой пояс Новосибирска
@@ -495,18 +585,13 @@ class CatBot:
         user_id = message.from_user.id
         
         # Ищем котика, к которому подключен пользователь
-        owner_id = None
-        for cat_owner_id, cat in self.storage.cats.items():
-            if user_id == cat_owner_id or user_id in cat.connected_users:
-                owner_id = cat_owner_id
-                break
-                
-        if not owner_id:
+        owner_id = self.storage.find_owner(user_id)
+        if owner_id is None:
             await message.answer("У тебя нет котика! 😿")
             await state.clear()
             return
             
-        cat = self.storage.cats[owner_id]
+        cat = self.storage.get_cat(owner_id)
         is_connected_user = user_id != owner_id
         
         if message.text.lower() == 'отмена':
@@ -550,65 +635,22 @@ class CatBot:
             
             # Обновляем время прогулки
             cat.walk_time = walk_time
-            self.storage.save()
+            self.storage.save_cat(owner_id)
             
             # Уведомляем владельца о смене времени прогулки
             if is_connected_user:
-                await self.bot.send_message(
+                self.outbox.send_message(
                     owner_id,
                     f"Стас установил время прогулки на {time_str} 🕒"
                 )
             
-            # Настраиваем напоминания
-            walk_id = f"walk_{owner_id}"
-            
-            # Удаляем старые напоминания, если они есть
-            for job in self.scheduler.get_jobs():
-                if job.id.startswith(walk_id):
-                    self.scheduler.remove_job(job.id)
-            
-            # Устанавливаем время для напоминаний
-            walk_datetime = datetime.now().replace(hour=hour, minute=minute, second=0, microsecond=0)
-            if walk_datetime < datetime.now():
-                walk_datetime += timedelta(days=1)
-            
-            # Добавляем напоминания
-            reminders = [
-                (60, "До прогулки остался 1 час! ⏰"),
-                (30, "До прогулки осталось 30 минут! ⏰"),
-                (10, "До прогулки осталось 10 минут! ⏰"),
-                (0, "Пора гулять! 🚶‍♂️")
-            ]
-            
-            for minutes_before, text in reminders:
-                notify_datetime = walk_datetime - timedelta(minutes=minutes_before)
-                
-                # Если время уведомления уже прошло, пропускаем его
-                if notify_datetime <= datetime.now():
-                    continue
-                
-                self.scheduler.add_job(
-                    self.send_walk_notification,
-                    'date',
-                    run_date=notify_datetime,
-                    args=[owner_id, f"{text} {cat.name.capitalize()} ждёт 🐱"],
-                    id=f"{walk_id}_{minutes_before}"
-                )
-                
-                # Отправляем уведомления и подключенным пользователям
-                for connected_user in cat.connected_users:
-                    self.scheduler.add_job(
-                        self.send_walk_notification,
-                        'date',
-                        run_date=notify_datetime,
-                        args=[connected_user, f"{text}"],
-                        id=f"{walk_id}_{minutes_before}_{connected_user}"
-                    )
+            # Настраиваем напоминания (старые, если они были, заменяются)
+            self.schedule_walk(owner_id, hour, minute)
             
             # Настраиваем уведомления
             await message.answer(
                 f"Время прогулки установлено на {time_str}! ⏰\n\n"
-                "Я напомню о прогулке:\n"
+                "Каждый день я напомню о прогулке:\n"
                 "- За 1 час до прогулки 🕐\n"
                 "- За 30 минут до прогулки 🕐\n"
                 "- За 10 минут до прогулки 🕐\n"
@@ -632,8 +674,50 @@ class CatBot:
                 reply_markup=keyboard
             )
 
-    async def send_walk_notification(self, user_id: int, text: str):
-        await self.bot.send_message(user_id, text)
+    def next_walk_at(self, hour: int, minute: int) -> datetime:
+        # Ближайшая прогулка в часовом поясе бота: сегодня или, если время прошло, завтра
+        tz = timezone(self.config.timezone)
+        now = datetime.now(tz)
+        walk_date = now.date()
+        if (hour, minute) < (now.hour, now.minute):
+            walk_date += timedelta(days=1)
+        return tz.localize(datetime.combine(walk_date, time(hour, minute)))
+
+    def schedule_walk(self, owner_id: int, hour: int, minute: int):
+        # Напоминания повторяются каждый день, пока время прогулки не удалят
+        self.reminders.schedule(owner_id, self.next_walk_at(hour, minute))
+
+    def rehydrate_walks(self):
+        """Восстанавливает напоминания о прогулках всех котиков из хранилища одним проходом."""
+        started = datetime.now()
+        # Разных значений времени прогулки не больше 1440, поэтому каждое разбираем один раз
+        walk_times = self.storage.walk_times()
+        walk_minutes = {}
+        for _, walk_time in walk_times:
+            if walk_time not in walk_minutes:
+                hour, minute = map(int, walk_time.split(':'))
+                walk_minutes[walk_time] = self.reminders.minute_of(self.next_walk_at(hour, minute).timestamp())
+        
+        self.reminders.rebuild(
+            (owner_id, walk_minutes[walk_time])
+            for owner_id, walk_time in walk_times
+        )
+        elapsed = (datetime.now() - started).total_seconds() * 1000
+        logger.info(f"Напоминания о прогулках восстановлены: {len(self.reminders)} котиков за {elapsed:.1f} мс")
+
+    async def send_walk_reminder(self, owner_id: int, minutes_before: int):
+        """Рассылает напоминание о прогулке владельцу и подключенным пользователям."""
+        cat = self.storage.cats.get(owner_id)
+        if cat is None:
+            return
+        text = WALK_REMINDERS[minutes_before]
+        self.send_walk_notification(owner_id, f"{text} {cat.name.capitalize()} ждёт 🐱")
+        for connected_user in cat.connected_users:
+            self.send_walk_notification(connected_user, text)
+
+    def send_walk_notification(self, user_id: int, text: str):
+        # Напоминания уходят через общую очередь отправки и не задерживают тик колеса
+        self.outbox.send_message(user_id, text)
 
     async def cmd_connect(self, message: Message, state: FSMContext):
         user_id = message.from_user.id
@@ -652,27 +736,27 @@ class CatBot:
         code = message.text.upper()
         user_id = message.from_user.id
         
-        if code not in self.storage.connection_codes:
+        entry = self.storage.connection_codes.get(code)
+        if entry is None:
             await message.answer("Неверный код подключения! ❌")
             await state.clear()
             return
             
-        owner_id, expires = self.storage.connection_codes[code]
+        owner_id, expires = entry
         
         if datetime.now() > expires:
             await message.answer("Код подключения истек! ⌛")
             del self.storage.connection_codes[code]
-            self.storage.save()
+            self.storage.save_code(code)
             await state.clear()
             return
             
-        cat = self.storage.cats[owner_id]
-        if user_id not in cat.connected_users:
-            cat.connected_users.append(user_id)
-            self.storage.save()
+        cat = self.storage.get_cat(owner_id)
+        if self.storage.connect_user(owner_id, user_id):
+            self.storage.save_cat(owner_id)
             
             # Отправляем уведомление владельцу
-            await self.bot.send_message(
+            self.outbox.send_message(
                 owner_id,
                 "Стас подключился к котику 🤝"
             )
@@ -692,61 +776,53 @@ class CatBot:
 
     async def start(self):
         self.scheduler.start()
-        await self.dp.start_polling(self.bot)
-
-    async def check_walk_reminders(self):
-        now = datetime.now(timezone(self.config.timezone))
-        current_time = now.strftime('%H:%M')
-        
-        for cat in self.storage.cats.values():
-            if not cat.walk_time:
-                continue
-            
-            # Если текущее время больше времени прогулки, удаляем прогулку
-            if current_time > cat.walk_time:
-                cat.walk_time = None
-                self.storage.save()
-                continue
-            
-            # Вычисляем разницу во времени
-            current_hours, current_minutes = map(int, current_time.split(':'))
-            walk_hours, walk_minutes = map(int, cat.walk_time.split(':'))
-            
-            total_current_minutes = current_hours * 60 + current_minutes
-            total_walk_minutes = walk_hours * 60 + walk_minutes
-            minutes_left = total_walk_minutes - total_current_minutes
-            
-            if 0 <= minutes_left <= 30:
-                if minutes_left > 0:
-                    message = f"До прогулки осталось {minutes_left} минут!"
-                else:
-                    message = f"Пора гулять! 🐱"
-                    cat.walk_time = None
-                    self.storage.save()
-                
-                await self.bot.send_message(cat.owner_id, message)
-                for user_id in cat.connected_users:
-                    await self.bot.send_message(user_id, message)
+        self.rehydrate_walks()
+        self.outbox.start()
+        reminders = asyncio.create_task(self.reminders.run(self.send_walk_reminder))
+        # Рассылки, прерванные перезапуском, досылаются в фоне
+        broadcasts = asyncio.create_task(self.resume_broadcasts())
+        flusher = None
+        if self.storage.write_behind:
+            flusher = asyncio.create_task(self.storage.run_flusher())
+        try:
+            await self.dp.start_polling(self.bot)
+        finally:
+            reminders.cancel()
+            broadcasts.cancel()
+            await asyncio.gather(reminders, broadcasts, return_exceptions=True)
+            # Доотправляем уведомления, которые уже стоят в очереди
+            await self.outbox.close()
+            # Сбрасываем на диск всё, что не успела записать фоновая задача
+            if flusher is not None:
+                flusher.cancel()
+                await asyncio.gather(flusher, return_exceptions=True)
+            self.storage.flush()
+            self.storage.close()
+            self.file_ids.flush()
+            self.renderer.close()
+            if self.storage.write_behind:
+                logger.info(f"Статистика записи данных: {self.storage.flush_stats()}")
+            logger.info(f"Статистика кэша картинок: {self.image_generator.cache.stats()}")
+            logger.info(f"Статистика очереди отрисовки: {self.renderer.stats()}")
+            # При отрисовке в пуле процессов этапы замеряются в процессах-исполнителях
+            logger.info(f"Время этапов отрисовки: {self.image_generator.stage_stats()}")
+            logger.info(f"Статистика кэша file_id: {self.file_ids.stats()}")
+            logger.info(f"Статистика фоновой отправки: {self.outbox.stats}")
 
     async def cmd_message(self, message: Message, state: FSMContext):
         user_id = message.from_user.id
         
         # Ищем котика, к которому подключен пользователь
-        owner_id = None
-        for cat_owner_id, cat in self.storage.cats.items():
-            if user_id == cat_owner_id or user_id in cat.connected_users:
-                owner_id = cat_owner_id
-                break
-                
-        if not owner_id:
+        owner_id = self.storage.find_owner(user_id)
+        if owner_id is None:
             await message.answer("У вас нет котика! 😿")
             return
             
-        cat = self.storage.cats[owner_id]
+        cat = self.storage.get_cat(owner_id)
         
         # Проверяем, прошло ли 24 часа с момента последнего сообщения
         now = datetime.now(timezone(self.config.timezone))
-        last_message_date = cat.last_messages.get(user_id)
+        last_message_date = cat.get_last_message(user_id)
         
         if last_message_date:
             # Преобразуем время последнего сообщения в часовой пояс Новосибирска
@@ -772,16 +848,16 @@ class CatBot:
         user_id = message.from_user.id
         data = await state.get_data()
         owner_id = data['owner_id']
-        cat = self.storage.cats[owner_id]
+        cat = self.storage.get_cat(owner_id)
         
         # Отправляем сообщение всем пользователям, кроме отправителя
-        recipients = [owner_id] + cat.connected_users
-        recipients.remove(user_id)
+        recipients = [recipient for recipient in (owner_id, *cat.connected_users) if recipient != user_id]
         
         # Определяем имя отправителя
         sender_name = "Маша" if user_id == owner_id else "Стас"
         message_text = "отправила" if user_id == owner_id else "отправил"
         
+        # Сообщения уходят в фоне через очередь отправки, отправитель не ждёт доставки
         for recipient in recipients:
             if message.photo:
                 # Если есть фото, отправляем его с подписью
@@ -789,21 +865,21 @@ class CatBot:
                 caption = f"💌 {sender_name} {message_text} фото:"
                 if message.caption:
                     caption += f"\n{message.caption}"
-                await self.bot.send_photo(
+                self.outbox.send_photo(
                     recipient,
                     photo.file_id,
                     caption=caption
                 )
             else:
                 # Если только текст, отправляем как обычно
-                await self.bot.send_message(
+                self.outbox.send_message(
                     recipient,
                     f"💌 {sender_name} {message_text} сообщение:\n{message.text}"
                 )
         
         # Сохраняем время отправки сообщения с учетом часового пояса
-        cat.last_messages[user_id] = datetime.now(timezone(self.config.timezone))
-        self.storage.save()
+        cat.set_last_message(user_id, datetime.now(timezone(self.config.timezone)))
+        self.storage.save_cat(owner_id)
         
         await message.answer("Сообщение отправлено! ✉️")
         await state.clear()
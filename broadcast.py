@@ -0,0 +1,235 @@
+import asyncio
+import json
+import logging
+import os
+import time
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional
+
+from aiogram import Bot
+from aiogram.exceptions import (
+    TelegramAPIError,
+    TelegramBadRequest,
+    TelegramForbiddenError,
+    TelegramNetworkError,
+    TelegramRetryAfter,
+    TelegramServerError
+)
+
+from rate_limit import ChatLimiter, TokenBucket
+
+logger = logging.getLogger(__name__)
+
+SENT = 'sent'
+BLOCKED = 'blocked'   # Пользователь заблокировал бота или удалил чат
+FAILED = 'failed'
+
+
+def broadcasts_path(storage_path: str) -> str:
+    """data.json -> data.broadcasts (папка рядом с основным хранилищем)"""
+    root, _ = os.path.splitext(storage_path)
+    return f"{root}.broadcasts"
+
+
+def trim_partial_line(file_path: str):
+    """Обрезает файл до последней целой строки.
+
+    Если процесс упал посреди записи, последняя строка осталась без перевода
+    строки, и следующая дозапись склеилась бы с ней в одну нечитаемую строку.
+    """
+    with open(file_path, 'rb+') as f:
+        data = f.read()
+        if data and not data.endswith(b'\n'):
+            f.truncate(data.rfind(b'\n') + 1)
+
+
+class Broadcast:
+    """Рассылка: получатели, текст и результат отправки каждому получателю.
+
+    На диске это файл JSON Lines: первая строка - описание рассылки,
+    дальше по строке [chat_id, результат] на получателя и в конце
+    {"finished": true}. Строки только дописываются, поэтому после
+    перезапуска рассылка продолжается с тех, кому ещё ничего не отправлено.
+    """
+
+    def __init__(self, broadcast_id: str, recipients: List[int], text: Optional[str] = None,
+                 texts: Optional[Dict[int, str]] = None, created_at: Optional[str] = None):
+        self.broadcast_id = broadcast_id
+        self.recipients = recipients
+        self.text = text
+        self.texts = texts or {}     # Личные тексты отдельных получателей
+        self.created_at = created_at or datetime.now().isoformat()
+        self.outcomes: Dict[int, str] = {}
+        self.finished = False
+
+    def text_for(self, chat_id: int) -> str:
+        return self.texts.get(chat_id, self.text)
+
+    def pending(self) -> List[int]:
+        return [chat_id for chat_id in self.recipients if chat_id not in self.outcomes]
+
+    def header(self) -> dict:
+        return {
+            'id': self.broadcast_id,
+            'created_at': self.created_at,
+            'text': self.text,
+            'texts': {str(chat_id): text for chat_id, text in self.texts.items()},
+            'recipients': self.recipients
+        }
+
+    @classmethod
+    def read(cls, file_path: str) -> 'Broadcast':
+        with open(file_path, 'r', encoding='utf-8') as f:
+            header = json.loads(f.readline())
+            broadcast = cls(
+                header['id'],
+                header['recipients'],
+                header.get('text'),
+                {int(chat_id): text for chat_id, text in header.get('texts', {}).items()},
+                header.get('created_at')
+            )
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    # Строка, оборванная при падении; следующие за ней записи по-прежнему действительны
+                    continue
+                if isinstance(entry, dict):
+                    broadcast.finished = entry.get('finished', False)
+                else:
+                    chat_id, outcome = entry
+                    broadcast.outcomes[chat_id] = outcome
+        return broadcast
+
+    def summary(self) -> dict:
+        counts = {SENT: 0, BLOCKED: 0, FAILED: 0}
+        for outcome in self.outcomes.values():
+            counts[outcome] = counts.get(outcome, 0) + 1
+        return {
+            'id': self.broadcast_id,
+            'recipients': len(self.recipients),
+            'pending': len(self.recipients) - len(self.outcomes),
+            'finished': self.finished,
+            **counts
+        }
+
+
+class BroadcastEngine:
+    """Параллельная рассылка в пределах ограничений Telegram.
+
+    Сообщения отправляют concurrency задач. Общая скорость ограничена ведром
+    токенов (rate сообщений в секунду), в один чат пишем не чаще раза в
+    chat_interval секунд. На RetryAfter рассылка целиком ждёт указанное время,
+    а ошибка одного получателя не останавливает остальных.
+    """
+
+    def __init__(self, bot: Bot, directory: str, rate: float = 25.0, chat_interval: float = 1.0,
+                 concurrency: int = 16, max_attempts: int = 3, bucket: Optional[TokenBucket] = None):
+        self.bot = bot
+        self.directory = directory
+        # Ведро можно разделить с другими фоновыми отправками, чтобы общий поток не превышал лимит
+        self.bucket = bucket if bucket is not None else TokenBucket(rate)
+        self.chats = ChatLimiter(chat_interval)
+        self.concurrency = concurrency
+        self.max_attempts = max_attempts
+        self.active: Dict[str, asyncio.Future] = {}
+        os.makedirs(directory, exist_ok=True)
+
+    def path(self, broadcast_id: str) -> str:
+        return os.path.join(self.directory, f"{broadcast_id}.jsonl")
+
+    def load(self, broadcast_id: str) -> Optional[Broadcast]:
+        path = self.path(broadcast_id)
+        if not os.path.exists(path):
+            return None
+        try:
+            return Broadcast.read(path)
+        except Exception as e:
+            logger.error(f"Ошибка чтения рассылки {path}: {e}")
+            return None
+
+    def unfinished(self) -> List[Broadcast]:
+        broadcasts = []
+        for name in sorted(os.listdir(self.directory)):
+            if name.endswith('.jsonl'):
+                broadcast = self.load(name[:-len('.jsonl')])
+                if broadcast is not None and not broadcast.finished:
+                    broadcasts.append(broadcast)
+        return broadcasts
+
+    async def run(self, broadcast_id: str, recipients: Iterable[int], text: Optional[str] = None,
+                  texts: Optional[Dict[int, str]] = None) -> dict:
+        """Запускает рассылку или продолжает уже начатую с тем же broadcast_id."""
+        if broadcast_id in self.active:
+            # Та же рассылка уже идёт (например, досылается после перезапуска) - ждём её
+            await asyncio.shield(self.active[broadcast_id])
+            return self.load(broadcast_id).summary()
+        broadcast = self.load(broadcast_id)
+        if broadcast is None:
+            # Каждому получателю - одно сообщение, даже если он встречается дважды
+            broadcast = Broadcast(broadcast_id, list(dict.fromkeys(recipients)), text, texts)
+            with open(self.path(broadcast_id), 'w', encoding='utf-8') as f:
+                f.write(json.dumps(broadcast.header(), ensure_ascii=False) + '\n')
+        if not broadcast.finished:
+            task = self.active[broadcast_id] = asyncio.ensure_future(self.deliver(broadcast))
+            task.add_done_callback(lambda _: self.active.pop(broadcast_id, None))
+            await task
+        return broadcast.summary()
+
+    async def resume_all(self) -> List[dict]:
+        """Досылает рассылки, прерванные перезапуском."""
+        return [await self.run(broadcast.broadcast_id, broadcast.recipients) for broadcast in self.unfinished()]
+
+    async def deliver(self, broadcast: Broadcast):
+        started = time.perf_counter()
+        queue = asyncio.Queue()
+        for chat_id in broadcast.pending():
+            queue.put_nowait(chat_id)
+
+        path = self.path(broadcast.broadcast_id)
+        trim_partial_line(path)
+        with open(path, 'a', encoding='utf-8') as log:
+            def record(chat_id: int, outcome: str):
+                broadcast.outcomes[chat_id] = outcome
+                log.write(json.dumps([chat_id, outcome]) + '\n')
+                log.flush()
+
+            async def worker():
+                while not queue.empty():
+                    chat_id = queue.get_nowait()
+                    record(chat_id, await self.send(chat_id, broadcast.text_for(chat_id)))
+
+            workers = min(self.concurrency, queue.qsize())
+            await asyncio.gather(*(worker() for _ in range(workers)))
+            broadcast.finished = True
+            log.write(json.dumps({'finished': True}) + '\n')
+
+        self.chats.prune()
+        logger.info(f"Рассылка {broadcast.broadcast_id} завершена за {time.perf_counter() - started:.1f} с: {broadcast.summary()}")
+
+    async def send(self, chat_id: int, text: str) -> str:
+        attempts = 0
+        while True:
+            await self.chats.acquire(chat_id)
+            await self.bucket.acquire()
+            try:
+                await self.bot.send_message(chat_id, text)
+                return SENT
+            except TelegramRetryAfter as e:
+                # Telegram просит подождать: притормаживаем всю рассылку, попытка не считается
+                self.bucket.pause(e.retry_after)
+                self.chats.pause(chat_id, e.retry_after)
+            except TelegramForbiddenError:
+                return BLOCKED
+            except TelegramBadRequest as e:
+                logger.warning(f"Не удалось отправить сообщение {chat_id}: {e}")
+                return FAILED
+            except (TelegramNetworkError, TelegramServerError) as e:
+                attempts += 1
+                if attempts >= self.max_attempts:
+                    logger.warning(f"Не удалось отправить сообщение {chat_id}: {e}")
+                    return FAILED
+                await asyncio.sleep(2 ** attempts)
+            except TelegramAPIError as e:
+                logger.warning(f"Не удалось отправить сообщение {chat_id}: {e}")
+                return FAILED
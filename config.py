@@ -10,11 +10,59 @@ class Config:
     night_end: time = time(6, 0)     # 06:00
     stats_decrease_hours: int = 6     # Уменьшение характеристик каждые 6 часов
     connection_code_ttl: int = 24     # Время жизни кода подключения в часах
+    storage_backend: str = 'json'     # json или sqlite
+    storage_path: str = 'data.json'
+    storage_shards: int = 1           # Число файлов-шардов для JSON-хранилища
+    storage_journal: bool = False     # Дописывать изменения в журнал вместо перезаписи файла
+    storage_compact_every: int = 1000 # Сворачивать журнал в снимок каждые N записей
+    storage_write_behind: bool = False   # Сохранять изменения в фоне, а не в обработчиках
+    storage_flush_interval: float = 5.0  # Интервал фоновой записи в секундах
+    storage_flush_after: int = 100       # Записывать досрочно после N изменений
+    render_cache_bytes: int = 32 * 1024 * 1024  # Предел кэша готовых картинок статуса
+    render_workers: int = 0           # Размер пула отрисовки (0 - рисовать прямо в обработчике)
+    render_pool: str = 'process'      # process или thread
+    render_max_pending: int = 32      # Сколько картинок может ждать отрисовки в пуле; остальные запросы отклоняются
+    png_compress_level: int = 6       # Уровень сжатия PNG (0-9)
+    png_optimize: bool = False        # Дополнительная оптимизация PNG (медленнее)
+    image_format: str = 'png'         # png, jpeg или webp
+    image_quality: int = 85           # Качество JPEG и WebP (1-100)
+    image_size: int = 800             # Сторона картинки статуса в пикселях (например 400, 600 или 800)
+    title_cache_size: int = 1024      # Сколько готовых заголовков карточки держать в памяти
+    file_id_cache_size: int = 10000   # Сколько file_id загруженных картинок помнить (0 - не запоминать)
+    status_edit_in_place: bool = True # Обновлять сообщение со статусом, а не удалять и отправлять заново
+    broadcast_rate: float = 25.0      # Сообщений в секунду для рассылок и фоновых уведомлений вместе (лимит Telegram - около 30)
+    broadcast_chat_interval: float = 1.0  # Не чаще одного сообщения в секунду в один чат
+    broadcast_concurrency: int = 16   # Сколько сообщений рассылки отправляется одновременно
+    dispatch_concurrency: int = 16    # Сколько чатов получают уведомления одновременно
 
 def load_config(path: str = None) -> Config:
     env = Env()
     env.read_env(path)
     
     return Config(
-        token=env.str('BOT_TOKEN')
+        token=env.str('BOT_TOKEN'),
+        storage_backend=env.str('STORAGE_BACKEND', 'json'),
+        storage_path=env.str('STORAGE_PATH', 'data.json'),
+        storage_shards=env.int('STORAGE_SHARDS', 1),
+        storage_journal=env.bool('STORAGE_JOURNAL', False),
+        storage_compact_every=env.int('STORAGE_COMPACT_EVERY', 1000),
+        storage_write_behind=env.bool('STORAGE_WRITE_BEHIND', False),
+        storage_flush_interval=env.float('STORAGE_FLUSH_INTERVAL', 5.0),
+        storage_flush_after=env.int('STORAGE_FLUSH_AFTER', 100),
+        render_cache_bytes=env.int('RENDER_CACHE_BYTES', 32 * 1024 * 1024),
+        render_workers=env.int('RENDER_WORKERS', 0),
+        render_pool=env.str('RENDER_POOL', 'process'),
+        render_max_pending=env.int('RENDER_MAX_PENDING', 32),
+        png_compress_level=env.int('PNG_COMPRESS_LEVEL', 6),
+        png_optimize=env.bool('PNG_OPTIMIZE', False),
+        image_format=env.str('IMAGE_FORMAT', 'png'),
+        image_quality=env.int('IMAGE_QUALITY', 85),
+        image_size=env.int('IMAGE_SIZE', 800),
+        title_cache_size=env.int('TITLE_CACHE_SIZE', 1024),
+        file_id_cache_size=env.int('FILE_ID_CACHE_SIZE', 10000),
+        status_edit_in_place=env.bool('STATUS_EDIT_IN_PLACE', True),
+        broadcast_rate=env.float('BROADCAST_RATE', 25.0),
+        broadcast_chat_interval=env.float('BROADCAST_CHAT_INTERVAL', 1.0),
+        broadcast_concurrency=env.int('BROADCAST_CONCURRENCY', 16),
+        dispatch_concurrency=env.int('DISPATCH_CONCURRENCY', 16)
     ) 
\ No newline at end of file
@@ -0,0 +1,115 @@
+import asyncio
+import logging
+from collections import deque
+from typing import Awaitable, Callable, Deque, Dict, Optional
+
+from aiogram import Bot
+from aiogram.exceptions import (
+    TelegramForbiddenError,
+    TelegramNetworkError,
+    TelegramRetryAfter,
+    TelegramServerError
+)
+
+from rate_limit import TokenBucket
+
+logger = logging.getLogger(__name__)
+
+Job = Callable[[], Awaitable]
+
+
+class OutboundDispatcher:
+    """Фоновая отправка уведомлений с ограниченной параллельностью.
+
+    У каждого чата своя очередь, и её обрабатывает не больше одной задачи
+    за раз, поэтому сообщения в один чат приходят в порядке отправки,
+    а разные чаты обслуживаются параллельно (до concurrency одновременно).
+    Обработчики только ставят сообщения в очередь и сразу отвечают пользователю.
+    """
+
+    def __init__(self, bot: Bot, concurrency: int = 16, bucket: Optional[TokenBucket] = None,
+                 max_retries: int = 5):
+        self.bot = bot
+        self.concurrency = concurrency
+        self.bucket = bucket
+        self.max_retries = max_retries
+        self.chats: Dict[int, Deque[Job]] = {}     # Чат -> ещё не отправленные сообщения
+        self.ready: asyncio.Queue = asyncio.Queue()  # Чаты, которые ждут свободную задачу
+        self.workers = []
+        self.stats = {'queued': 0, 'sent': 0, 'failed': 0, 'retried': 0}
+
+    def start(self):
+        self.workers = [asyncio.create_task(self.worker()) for _ in range(self.concurrency)]
+
+    def submit(self, chat_id: int, job: Job):
+        """Ставит отправку в очередь чата; job - функция без аргументов, возвращающая корутину."""
+        self.stats['queued'] += 1
+        queue = self.chats.get(chat_id)
+        if queue is not None:
+            # Чат уже в работе или ждёт её - сообщение уйдёт следом за предыдущими
+            queue.append(job)
+            return
+        self.chats[chat_id] = deque([job])
+        self.ready.put_nowait(chat_id)
+
+    def send_message(self, chat_id: int, text: str, **kwargs):
+        self.submit(chat_id, lambda: self.bot.send_message(chat_id, text, **kwargs))
+
+    def send_photo(self, chat_id: int, photo, **kwargs):
+        self.submit(chat_id, lambda: self.bot.send_photo(chat_id, photo, **kwargs))
+
+    async def worker(self):
+        while True:
+            chat_id = await self.ready.get()
+            queue = self.chats[chat_id]
+            try:
+                if not await self.run(chat_id, queue.popleft()):
+                    # Пользователь заблокировал бота: остальное в этот чат не отправляем
+                    self.stats['failed'] += len(queue)
+                    queue.clear()
+            finally:
+                if queue:
+                    # В чате остались сообщения: возвращаем его в конец очереди, чтобы
+                    # один занятый чат не задерживал остальные
+                    self.ready.put_nowait(chat_id)
+                else:
+                    del self.chats[chat_id]
+                self.ready.task_done()
+
+    async def run(self, chat_id: int, job: Job) -> bool:
+        """Отправляет одно сообщение с повторами. Возвращает False, если чат для бота закрыт."""
+        for _ in range(self.max_retries):
+            if self.bucket is not None:
+                await self.bucket.acquire()
+            try:
+                await job()
+                self.stats['sent'] += 1
+                return True
+            except TelegramRetryAfter as e:
+                # Следующие сообщения этого чата ждут вместе с этим, порядок сохраняется
+                self.stats['retried'] += 1
+                if self.bucket is not None:
+                    self.bucket.pause(e.retry_after)
+                await asyncio.sleep(e.retry_after)
+            except TelegramForbiddenError as e:
+                logger.warning(f"Чат {chat_id} недоступен для бота: {e}")
+                self.stats['failed'] += 1
+                return False
+            except (TelegramNetworkError, TelegramServerError):
+                self.stats['retried'] += 1
+                await asyncio.sleep(1)
+            except Exception as e:
+                logger.warning(f"Не удалось отправить сообщение {chat_id}: {e}")
+                break
+        self.stats['failed'] += 1
+        return True
+
+    async def close(self, timeout: float = 10.0):
+        """Даёт доотправить очередь (не дольше timeout секунд) и останавливает задачи."""
+        try:
+            await asyncio.wait_for(self.ready.join(), timeout)
+        except asyncio.TimeoutError:
+            logger.warning(f"Не доставлено уведомлений при остановке: {sum(len(queue) for queue in self.chats.values())}")
+        for worker in self.workers:
+            worker.cancel()
+        await asyncio.gather(*self.workers, return_exceptions=True)
@@ -0,0 +1,133 @@
+import asyncio
+import json
+import logging
+import os
+from collections import OrderedDict
+from typing import Hashable, List, Optional
+
+from models import write_json_atomic
+
+logger = logging.getLogger(__name__)
+
+
+def file_id_cache_path(storage_path: str) -> str:
+    """data.json -> data.file_ids.json (рядом с основным хранилищем)"""
+    root, _ = os.path.splitext(storage_path)
+    return f"{root}.file_ids.json"
+
+
+class FileIdCache:
+    """Соответствие ключа картинки и file_id, который Telegram вернул после загрузки.
+
+    Повторная отправка той же картинки идёт по file_id, без отрисовки и загрузки.
+    Вместе с file_id хранится file_unique_id: file_id одного и того же файла
+    может отличаться, поэтому узнать уже показанную картинку можно только по нему.
+    Размер ограничен max_entries (вытесняются давно не использованные),
+    а при смене ресурсов или шрифтов (другой fingerprint) кэш сбрасывается.
+    """
+
+    def __init__(self, file_path: str, fingerprint: str, max_entries: int = 10000):
+        self.file_path = file_path
+        self.fingerprint = fingerprint
+        self.max_entries = max_entries
+        self.entries: OrderedDict[str, List[str]] = OrderedDict()  # Ключ -> [file_id, file_unique_id]
+        self.dirty = False
+        self.hits = 0
+        self.misses = 0
+        self.stale = 0
+        self.load()
+
+    @staticmethod
+    def cache_key(key: Hashable) -> str:
+        return json.dumps(key, ensure_ascii=False)
+
+    def load(self):
+        if not os.path.exists(self.file_path):
+            return
+        try:
+            with open(self.file_path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except Exception as e:
+            logger.error(f"Ошибка при загрузке кэша file_id: {e}")
+            return
+        if data.get('fingerprint') != self.fingerprint:
+            # Ресурсы или шрифты поменялись - старые картинки больше не годятся
+            logger.info("Ресурсы картинок изменились, кэш file_id сброшен")
+            self.dirty = True
+            return
+        self.entries = OrderedDict(data.get('entries', {}))
+        self.evict()
+
+    def get(self, key: Hashable) -> Optional[str]:
+        if self.max_entries <= 0:
+            return None
+        key = self.cache_key(key)
+        entry = self.entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        self.entries.move_to_end(key)
+        self.hits += 1
+        return entry[0]
+
+    def unique_id(self, key: Hashable) -> Optional[str]:
+        """file_unique_id картинки (без учёта в статистике попаданий)."""
+        entry = self.entries.get(self.cache_key(key))
+        return entry[1] if entry is not None else None
+
+    def put(self, key: Hashable, file_id: str, file_unique_id: str):
+        if self.max_entries <= 0:
+            return
+        key = self.cache_key(key)
+        self.entries[key] = [file_id, file_unique_id]
+        self.entries.move_to_end(key)
+        self.evict()
+        self.dirty = True
+
+    def discard(self, key: Hashable):
+        """Убирает file_id, который Telegram отказался принять."""
+        if self.entries.pop(self.cache_key(key), None) is not None:
+            self.stale += 1
+            self.dirty = True
+
+    def evict(self):
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+
+    def snapshot(self) -> Optional[dict]:
+        """Копия несохранённых данных для записи. Вызывается в потоке цикла событий,
+        чтобы get и put не меняли записи, пока их сериализуют."""
+        if not self.dirty:
+            return None
+        self.dirty = False
+        return {'fingerprint': self.fingerprint, 'entries': {key: list(entry) for key, entry in self.entries.items()}}
+
+    def write(self, data: dict) -> bool:
+        try:
+            write_json_atomic(self.file_path, data)
+            return True
+        except Exception as e:
+            logger.error(f"Ошибка при сохранении кэша file_id: {e}")
+            return False
+
+    def flush(self):
+        data = self.snapshot()
+        if data is not None and not self.write(data):
+            self.dirty = True
+
+    async def flush_async(self):
+        """Снимок берётся в цикле событий, а на диск его пишет отдельный поток."""
+        data = self.snapshot()
+        if data is not None and not await asyncio.to_thread(self.write, data):
+            self.dirty = True
+
+    def stats(self) -> dict:
+        requests = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'stale': self.stale,
+            'hit_ratio': self.hits / requests if requests else 0.0,
+            'entries': len(self.entries),
+            'max_entries': self.max_entries
+        }
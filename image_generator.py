@@ -1,8 +1,69 @@
 from PIL import Image, ImageDraw, ImageFont
+from io import BytesIO
+from collections import OrderedDict
+from functools import lru_cache
+import glob
+import hashlib
+import itertools
+import math
 import os
+import threading
+import time
+
+from render_cache import RenderCache
+
+
+@lru_cache(maxsize=16)
+def load_font(path, size):
+    """Загружает шрифт один раз на процесс; path=None - встроенный шрифт Pillow."""
+    if path is None:
+        return ImageFont.load_default()
+    return ImageFont.truetype(path, size)
+
 
 class ImageGenerator:
-    def __init__(self):
+    WIDTH = 800
+    HEIGHT = 800
+
+    # Характеристики в порядке вывода и их цвета
+    STATS = (
+        ("СЫТОСТЬ", '#FFA07A'),  # Светлый лососевый
+        ("СЧАСТЬЕ", '#98FB98'),  # Светлый зеленый
+        ("ЭНЕРГИЯ", '#87CEEB')   # Небесно-голубой
+    )
+    MAX_STAT = 4  # Делений на характеристику
+    STATS_TOP = HEIGHT - 300  # Немного подняли статистику
+    STATS_ROW = 90
+    # Область делений всех трёх характеристик (left, top, right, bottom)
+    PANEL_BOX = (50, STATS_TOP + 40, 50 + 3 * 55 + 50 + 1, STATS_TOP + 40 + 2 * STATS_ROW + 25 + 1)
+
+    # Поддерживаемые форматы: имя в Pillow и расширение файла
+    FORMATS = {
+        'png': ('PNG', 'png'),
+        'jpeg': ('JPEG', 'jpg'),
+        'webp': ('WEBP', 'webp')
+    }
+
+    def __init__(self, cache_max_bytes: int = 32 * 1024 * 1024, png_compress_level: int = 6, png_optimize: bool = False,
+                 image_format: str = 'png', image_quality: int = 85, image_size: int = 800,
+                 title_cache_size: int = 1024):
+        if image_format not in self.FORMATS:
+            raise ValueError(f"Неизвестный формат картинок: {image_format}")
+
+        # Кэш готовых картинок (ключ - status_key)
+        self.cache = RenderCache(cache_max_bytes)
+        
+        # Настройки кодирования: картинки кодируются сразу в память, без временных файлов
+        self.png_compress_level = png_compress_level
+        self.png_optimize = png_optimize
+        self.image_format = image_format
+        self.image_quality = image_quality    # Для JPEG и WebP
+        self.image_size = image_size          # Сторона итоговой картинки
+        # Слои рисуются в координатах 800x800 и один раз уменьшаются до image_size,
+        # а картинка собирается уже в итоговом размере
+        self.scale = image_size / self.WIDTH
+        self.panel_box = self.tier_box(self.PANEL_BOX)
+        
         # Путь к папке с ресурсами
         self.resources_path = "resources"
         if not os.path.exists(self.resources_path):
@@ -13,26 +74,35 @@ class ImageGenerator:
         if not os.path.exists(self.fonts_path):
             os.makedirs(self.fonts_path)
         
-        # Пытаемся загрузить шрифт Tecmo Bowl
+        # Пытаемся загрузить шрифт Tecmo Bowl (объекты шрифтов общие для всех генераторов процесса)
         try:
             self.font_path = os.path.join(self.fonts_path, 'Tecmo Bowl.ttf')
             
             if os.path.exists(self.font_path):
                 # Используем разные размеры для разной иерархии текста
-                self.font_title = ImageFont.truetype(self.font_path, 24)    # Для заголовка
-                self.font_name = ImageFont.truetype(self.font_path, 24)     # Для имени
-                self.font_stats = ImageFont.truetype(self.font_path, 24)    # Для статистики
-                self.font_owner = ImageFont.truetype(self.font_path, 20)    # Для информации о хозяйке
+                self.font_title = load_font(self.font_path, 24)    # Для заголовка
+                self.font_name = load_font(self.font_path, 24)     # Для имени
+                self.font_stats = load_font(self.font_path, 24)    # Для статистики
+                self.font_owner = load_font(self.font_path, 20)    # Для информации о хозяйке
+                self.title_font_key = (self.font_path, 24)
             else:
                 raise FileNotFoundError("Шрифт не найден")
             
         except:
             # Если что-то пошло не так, используем дефолтный шрифт
-            default_font = ImageFont.load_default()
+            default_font = load_font(None, 0)
             self.font_title = default_font
             self.font_name = default_font
             self.font_stats = default_font
             self.font_owner = default_font
+            self.title_font_key = (None, 0)
+
+        # Готовые полоски заголовка: (имя, возраст, шрифт) -> (RGBA-плитка, позиция)
+        self.titles: OrderedDict[tuple, tuple] = OrderedDict()
+        self.title_cache_size = title_cache_size
+        self.titles_lock = threading.Lock()
+        self.title_hits = 0
+        self.title_misses = 0
 
         # Словари для транслитерации
         self.colors_trans = {
@@ -48,6 +118,53 @@ class ImageGenerator:
             "Энергия": "ENERGY"
         }
 
+        # Время этапов отрисовки: этап -> [количество, суммарное время в секундах]
+        # open, resize и base (подложки и подписи) выполняются один раз на цвет при запуске,
+        # scale - при запуске и для каждого нового заголовка (только если размер картинки не 800),
+        # остальные - на каждую картинку: copy - копия основы, bars - панель, text - заголовок
+        self.timings = {
+            stage: [0, 0.0]
+            for stage in ('open', 'resize', 'base', 'copy', 'bars', 'text', 'scale', 'encode')
+        }
+        self.timings_lock = threading.Lock()
+
+        # Статичная основа карточки для каждого цвета и спрайты панели характеристик
+        # для всех значений от 0 до 4 собираются один раз при запуске
+        self.bases = {}
+        self.panels = {}
+        for color in self.colors_trans:
+            self.base_layer(color)
+        for stats in itertools.product(range(self.MAX_STAT + 1), repeat=len(self.STATS)):
+            self.panel_sprite(*stats)
+
+    def load_background(self, color):
+        cat_image_path = os.path.join(self.resources_path, f"{color}_cat.png")
+        if not os.path.exists(cat_image_path):
+            return None
+        try:
+            started = time.perf_counter()
+            with Image.open(cat_image_path) as background:
+                background.load()
+                opened = time.perf_counter()
+                resized = background.resize((self.WIDTH, self.HEIGHT), Image.Resampling.LANCZOS)
+            self.record_stage('open', opened - started)
+            self.record_stage('resize', time.perf_counter() - opened)
+            return resized
+        except:
+            return None
+
+    def fingerprint(self) -> str:
+        """Хэш фонов, шрифтов, размера и формата: меняется, если картинки стали выглядеть иначе."""
+        digest = hashlib.sha1(
+            f"{self.WIDTH}x{self.HEIGHT}:{self.image_size}:{self.image_format}:{self.image_quality}".encode()
+        )
+        paths = glob.glob(os.path.join(self.resources_path, '*.png')) + glob.glob(os.path.join(self.fonts_path, '*.ttf'))
+        for path in sorted(paths):
+            digest.update(os.path.basename(path).encode())
+            with open(path, 'rb') as f:
+                digest.update(hashlib.sha1(f.read()).digest())
+        return digest.hexdigest()
+
     def transliterate_name(self, text):
         # Словарь для транслитерации имени
         trans = {'а': 'a', 'б': 'b', 'в': 'v', 'г': 'g', 'д': 'd', 'е': 'e', 'ё': 'e',
@@ -58,40 +175,178 @@ class ImageGenerator:
         
         return ''.join(trans.get(char.lower(), char) for char in text).upper()
 
-    def generate_status_image(self, color, name, hunger, happiness, energy, owner_m, owner_f, age_days):
-        WIDTH = 800
-        HEIGHT = 800
-        
-        # Пытаемся загрузить изображение котика
-        cat_image_path = os.path.join(self.resources_path, f"{color}_cat.png")
-        if os.path.exists(cat_image_path):
-            try:
-                background = Image.open(cat_image_path)
-                background = background.resize((WIDTH, HEIGHT), Image.Resampling.LANCZOS)
-                image = background
-            except:
-                image = Image.new('RGB', (WIDTH, HEIGHT), 'white')
-        else:
-            image = Image.new('RGB', (WIDTH, HEIGHT), 'white')
+    @staticmethod
+    def status_key(color, name, hunger, happiness, energy, age_days) -> tuple:
+        # Картинка зависит только от цвета, имени, характеристик и возраста
+        return (color, name, hunger, happiness, energy, age_days)
 
-        draw = ImageDraw.Draw(image)
+    def render_status(self, color, name, hunger, happiness, energy, age_days) -> bytes:
+        """PNG-картинка статуса котика (из кэша, если такая уже рисовалась)."""
+        return self.cache.get_or_render(
+            self.status_key(color, name, hunger, happiness, energy, age_days),
+            lambda: self.encode_status(color, name, hunger, happiness, energy, age_days)
+        )
+
+    def encode_status(self, color, name, hunger, happiness, energy, age_days) -> bytes:
+        """Рисует картинку статуса и кодирует её в заданный формат, минуя кэш."""
+        image = self.draw_status_image(color, name, hunger, happiness, energy, age_days)
+        return self.encode_image(image)
+
+    def encode_image(self, image) -> bytes:
+        started = time.perf_counter()
+        buffer = BytesIO()
+        match self.image_format:
+            case 'png':
+                image.save(buffer, format='PNG', compress_level=self.png_compress_level, optimize=self.png_optimize)
+            case 'jpeg':
+                image.convert('RGB').save(buffer, format='JPEG', quality=self.image_quality)
+            case 'webp':
+                image.save(buffer, format='WEBP', quality=self.image_quality)
+        self.record_stage('encode', time.perf_counter() - started)
+        return buffer.getvalue()
+
+    @property
+    def filename(self) -> str:
+        return f"status.{self.FORMATS[self.image_format][1]}"
+
+    def encode_settings(self) -> dict:
+        """Параметры отрисовки и кодирования, с которыми создаются генераторы в процессах пула."""
+        return {
+            'title_cache_size': self.title_cache_size,
+            'png_compress_level': self.png_compress_level,
+            'png_optimize': self.png_optimize,
+            'image_format': self.image_format,
+            'image_quality': self.image_quality,
+            'image_size': self.image_size
+        }
+
+    def draw_status_image(self, color, name, hunger, happiness, energy, age_days):
+        # Картинка собирается из готовых слоёв: статичная основа для цвета,
+        # спрайт панели характеристик и заголовок - единственная живая отрисовка
+        started = time.perf_counter()
+        image = self.base_layer(color).copy()
+        base_done = time.perf_counter()
+
+        sprite, position = self.panel_sprite(hunger, happiness, energy)
+        image.paste(sprite, position, sprite)
+        panel_done = time.perf_counter()
+
+        self.draw_title(image, name, age_days)
+        title_done = time.perf_counter()
+
+        self.record_stage('copy', base_done - started)
+        self.record_stage('bars', panel_done - base_done)
+        self.record_stage('text', title_done - panel_done)
+        return image
+
+    def base_layer(self, color):
+        """Фон котика с подложками и подписями характеристик - всё, что не зависит от состояния."""
+        base = self.bases.get(color)
+        if base is not None:
+            return base
+
+        background = self.load_background(color)
+        started = time.perf_counter()
+        if background is not None:
+            image = background
+        else:
+            image = Image.new('RGB', (self.WIDTH, self.HEIGHT), 'white')
 
         # Черный прямоугольник сверху для заголовка
-        top_overlay = Image.new('RGBA', (WIDTH, 60), (0, 0, 0, 120))
+        top_overlay = Image.new('RGBA', (self.WIDTH, 60), (0, 0, 0, 120))
         image.paste(top_overlay, (0, 0), top_overlay)
 
         # Черный прямоугольник снизу слева для статистики
         stats_overlay = Image.new('RGBA', (300, 300), (0, 0, 0, 120))
-        image.paste(stats_overlay, (30, HEIGHT - 320), stats_overlay)
+        image.paste(stats_overlay, (30, self.HEIGHT - 320), stats_overlay)
 
-        # Используем шрифты
+        # Названия характеристик
+        draw = ImageDraw.Draw(image)
+        y_position = self.STATS_TOP
+        for stat_name, stat_color in self.STATS:
+            draw.text((50, y_position), f">{stat_name}:", font=self.font_stats, fill=stat_color)
+            y_position += self.STATS_ROW
+
+        self.record_stage('base', time.perf_counter() - started)
+        image, _ = self.to_tier(image, (0, 0))
+        self.bases[color] = image
+        return image
+
+    def panel_sprite(self, hunger, happiness, energy):
+        """Деления всех трёх характеристик на прозрачном фоне (всего 5 * 5 * 5 вариантов).
+
+        Все варианты строятся при запуске; значение вне 0..4 достроится при первом обращении.
+        """
+        key = (hunger, happiness, energy)
+        cached = self.panels.get(key)
+        if cached is not None:
+            return cached
+
+        left, top, right, bottom = self.panel_box
+        sprite = Image.new('RGBA', (right - left, bottom - top), (0, 0, 0, 0))
+        draw = ImageDraw.Draw(sprite)
+
+        # Рисуем деления (4 прямоугольника) в координатах спрайта
+        rect_width = 50
+        rect_height = 25
+        rect_spacing = 5
+        y = self.STATS_TOP + 40 - top
+        for (_, stat_color), stat_value in zip(self.STATS, key):
+            for i in range(self.MAX_STAT):
+                x = 50 + i * (rect_width + rect_spacing) - left
+                if stat_value >= i + 1:
+                    draw.rectangle([(x, y), (x + rect_width, y + rect_height)], fill=stat_color)
+                else:
+                    draw.rectangle([(x, y), (x + rect_width, y + rect_height)], outline=stat_color, width=2)
+            y += self.STATS_ROW
+
+        cached = self.panels[key] = self.to_tier(sprite, (left, top))
+        return cached
+
+    def tier_box(self, box):
+        """Расширяет область так, чтобы её границы после уменьшения попадали на целые пиксели."""
+        step = self.WIDTH // math.gcd(self.WIDTH, self.image_size)
+        left, top, right, bottom = box
+        return (
+            left // step * step,
+            top // step * step,
+            min(self.WIDTH, -(-right // step) * step),
+            min(self.HEIGHT, -(-bottom // step) * step)
+        )
+
+    def to_tier(self, layer, position):
+        """Переводит слой, нарисованный в координатах 800x800, в размер итоговой картинки."""
+        if self.image_size == self.WIDTH:
+            return layer, position
+        started = time.perf_counter()
+        size = (round(layer.width * self.scale), round(layer.height * self.scale))
+        scaled = layer.resize(size, Image.Resampling.LANCZOS)
+        self.record_stage('scale', time.perf_counter() - started)
+        return scaled, (round(position[0] * self.scale), round(position[1] * self.scale))
+
+    def draw_title(self, image, name, age_days):
+        tile, position = self.title_tile(name, age_days)
+        image.paste(tile, position, tile)
+
+    def title_tile(self, name, age_days):
+        """Заголовок с линиями на прозрачной плитке; плитки кэшируются по имени, возрасту и шрифту."""
+        key = (name, age_days, self.title_font_key)
+        with self.titles_lock:
+            cached = self.titles.get(key)
+            if cached is not None:
+                self.titles.move_to_end(key)
+                self.title_hits += 1
+                return cached
+            self.title_misses += 1
+
+        strip = Image.new('RGBA', (self.WIDTH, 60), (0, 0, 0, 0))
+        draw = ImageDraw.Draw(strip)
         title_font = self.font_title
-        stats_font = self.font_stats
 
         # Заголовок с декоративными линиями
         title = f"котик {name.capitalize()} ({age_days} дн.)"
         title_width = title_font.getlength(title)
-        x_center = (WIDTH - title_width) // 2
+        x_center = (self.WIDTH - title_width) // 2
         
         # Золотые линии вокруг заголовка
         line_length = 80
@@ -108,33 +363,35 @@ class ImageGenerator:
         draw.line([(x_center + title_width + padding, y_title + 10),
                    (x_center + title_width + line_length + padding, y_title + 10)], fill=title_color, width=2)
 
-        # Статистика
-        y_position = HEIGHT - 300  # Немного подняли статистику
-        stats = [
-            ("СЫТОСТЬ", hunger, '#FFA07A'),  # Светлый лососевый
-            ("СЧАСТЬЕ", happiness, '#98FB98'),  # Светлый зеленый
-            ("ЭНЕРГИЯ", energy, '#87CEEB')  # Небесно-голубой
-        ]
-        
-        for stat_name, stat_value, color in stats:
-            # Название параметра
-            draw.text((50, y_position), f">{stat_name}:", font=stats_font, fill=color)
-            
-            # Рисуем деления (4 прямоугольника)
-            rect_width = 50
-            rect_height = 25
-            rect_spacing = 5
-            for i in range(4):
-                x = 50 + i * (rect_width + rect_spacing)
-                y = y_position + 40
-                if stat_value >= i + 1:
-                    draw.rectangle([(x, y), (x + rect_width, y + rect_height)], fill=color)
-                else:
-                    draw.rectangle([(x, y), (x + rect_width, y + rect_height)], outline=color, width=2)
-            
-            y_position += 90
+        # Храним только непрозрачную часть полоски, уже в размере итоговой картинки
+        strip, _ = self.to_tier(strip, (0, 0))
+        box = strip.getbbox() or (0, 0, 1, 1)
+        cached = (strip.crop(box), box[:2])
+        if self.title_cache_size > 0:
+            with self.titles_lock:
+                self.titles[key] = cached
+                while len(self.titles) > self.title_cache_size:
+                    self.titles.popitem(last=False)
+        return cached
+
+    def record_stage(self, stage: str, seconds: float):
+        with self.timings_lock:
+            timing = self.timings[stage]
+            timing[0] += 1
+            timing[1] += seconds
 
-        # Сохраняем изображение
-        temp_path = os.path.join(self.resources_path, "temp_status.png")
-        image.save(temp_path)
-        return temp_path
\ No newline at end of file
+    def stage_stats(self) -> dict:
+        """Среднее время каждого этапа отрисовки в миллисекундах."""
+        with self.timings_lock:
+            stats = {
+                stage: {'count': count, 'avg_ms': round(total / count * 1000, 3) if count else 0.0}
+                for stage, (count, total) in self.timings.items()
+            }
+        with self.titles_lock:
+            stats['title_cache'] = {
+                'hits': self.title_hits,
+                'misses': self.title_misses,
+                'entries': len(self.titles),
+                'max_entries': self.title_cache_size
+            }
+        return stats
@@ -0,0 +1,102 @@
+import json
+import re
+from typing import Any, Iterable, Iterator, Tuple
+
+WHITESPACE = ' \t\n\r'
+NUMBER_START = '-0123456789'
+NUMBER_END = re.compile(r'[\s,\]}]')
+
+
+class StreamReader:
+    """Пошаговый разбор JSON-файла без загрузки всего дерева в память.
+
+    Файл читается кусками по chunk_size символов, а в буфере держится только
+    ещё не разобранный хвост.
+    """
+
+    def __init__(self, file, chunk_size: int = 64 * 1024):
+        self.file = file
+        self.chunk_size = chunk_size
+        self.decoder = json.JSONDecoder()
+        self.buffer = ''
+        self.pos = 0
+        self.eof = False
+
+    def fill(self) -> bool:
+        if self.eof:
+            return False
+        chunk = self.file.read(self.chunk_size)
+        if not chunk:
+            self.eof = True
+            return False
+        # Отбрасываем уже разобранную часть буфера
+        self.buffer = self.buffer[self.pos:] + chunk
+        self.pos = 0
+        return True
+
+    def peek(self) -> str:
+        """Пропускает пробелы и возвращает следующий символ ('' в конце файла)."""
+        while True:
+            while self.pos < len(self.buffer) and self.buffer[self.pos] in WHITESPACE:
+                self.pos += 1
+            if self.pos < len(self.buffer):
+                return self.buffer[self.pos]
+            if not self.fill():
+                return ''
+
+    def expect(self, char: str):
+        if self.peek() != char:
+            raise json.JSONDecodeError(f"Ожидался символ {char!r}", self.buffer, self.pos)
+        self.pos += 1
+
+    def value(self) -> Any:
+        """Разбирает одно значение целиком, при необходимости дочитывая файл."""
+        if self.peek() in NUMBER_START:
+            # Число могло оборваться на границе куска: дочитываем до разделителя
+            while not NUMBER_END.search(self.buffer, self.pos) and self.fill():
+                pass
+        while True:
+            try:
+                value, end = self.decoder.raw_decode(self.buffer, self.pos)
+            except json.JSONDecodeError:
+                if self.fill():
+                    continue
+                raise
+            self.pos = end
+            return value
+
+    def keys(self) -> Iterator[str]:
+        """Перебирает ключи объекта; значение после ключа читает вызывающий код."""
+        self.expect('{')
+        if self.peek() == '}':
+            self.pos += 1
+            return
+        while True:
+            key = self.value()
+            self.expect(':')
+            yield key
+            char = self.peek()
+            self.pos += 1
+            if char == '}':
+                return
+            if char != ',':
+                raise json.JSONDecodeError("Ожидался символ ',' или '}'", self.buffer, self.pos - 1)
+
+
+def iter_sections(file_path: str, sections: Iterable[str], chunk_size: int = 64 * 1024) -> Iterator[Tuple[str, str, Any]]:
+    """Выдаёт (раздел, ключ, значение) для каждой записи вложенных объектов верхнего уровня.
+
+    Например, для {"cats": {"1": {...}}} и sections=('cats',) выдаст ('cats', '1', {...}).
+    Остальные разделы пропускаются.
+    """
+    sections = set(sections)
+    with open(file_path, 'r', encoding='utf-8') as f:
+        reader = StreamReader(f, chunk_size)
+        for section in reader.keys():
+            if section in sections and reader.peek() == '{':
+                for key in reader.keys():
+                    yield section, key, reader.value()
+            else:
+                reader.value()
+        if reader.peek():
+            raise json.JSONDecodeError("Лишние данные после JSON", reader.buffer, reader.pos)
@@ -1,27 +1,160 @@
-from dataclasses import dataclass, field
-from datetime import datetime, time
-from typing import Optional, List, Dict
+from collections.abc import MutableMapping
+from datetime import datetime, time, timezone
+from typing import Optional, Set, Dict, List, Iterable, Tuple, Union
+import asyncio
+import heapq
 import json
 import os
+import random
+import string
+import sys
+import threading
+import time as time_module
+
+from json_stream import iter_sections
+
+def peak_rss_mb() -> float:
+    """Пиковый объём памяти процесса в МБ (0, если платформа не позволяет узнать)."""
+    try:
+        import resource
+    except ImportError:
+        return 0.0
+    # В Linux ru_maxrss в килобайтах, в macOS - в байтах
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+def write_json_atomic(file_path: str, data: dict):
+    # Пишем во временный файл и атомарно подменяем исходный,
+    # чтобы падение посреди записи не испортило старые данные
+    tmp_path = f"{file_path}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, ensure_ascii=False, indent=2)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, file_path)
 
-@dataclass
 class Cat:
-    owner_id: int
-    name: str
-    color: str
-    hunger: int = 4
-    happiness: int = 4
-    energy: int = 4
-    created_at: datetime = field(default_factory=datetime.now)
-    walk_time: Optional[str] = None
-    connected_users: List[int] = field(default_factory=list)
-    last_messages: Dict[int, datetime] = field(default_factory=dict)
+    """Котик в компактном представлении.
+    
+    Характеристики упакованы в одно число, подключенные пользователи хранятся
+    кортежем, а даты - unix-временем. Строки ISO из файла разбираются
+    только при первом обращении к соответствующей дате.
+    """
+    __slots__ = (
+        'owner_id', 'name', 'color', 'walk_time', 'connected_users',
+        'stats_updated_at', '_stats', '_created_at', '_last_messages'
+    )
     
+    def __init__(
+        self,
+        owner_id: int,
+        name: str,
+        color: str,
+        hunger: int = 4,
+        happiness: int = 4,
+        energy: int = 4,
+        created_at: Union[datetime, float, str, None] = None,
+        walk_time: Optional[str] = None,
+        connected_users: Iterable[int] = (),
+        last_messages: Optional[Dict[int, Union[datetime, float, str]]] = None,
+        stats_updated_at: Optional[float] = None
+    ):
+        self.owner_id = owner_id
+        self.name = name
+        self.color = color
+        self._stats = self._check_stat(hunger) | self._check_stat(happiness) << 4 | self._check_stat(energy) << 8
+        # Строку ISO оставляем как есть до первого обращения
+        self._created_at = time_module.time() if created_at is None else self._pack_date(created_at)
+        self.walk_time = walk_time
+        self.connected_users: Tuple[int, ...] = tuple(connected_users)
+        # Словарь заводим, только когда появляется первое сообщение
+        self._last_messages = None
+        for user_id, date in (last_messages or {}).items():
+            self.set_last_message(user_id, date)
+        # Момент, до которого уже учтено уменьшение характеристик (unix-время)
+        self.stats_updated_at = time_module.time() if stats_updated_at is None else stats_updated_at
+
+    @staticmethod
+    def _pack_date(date: Union[datetime, float, str]) -> Union[float, str]:
+        return date.timestamp() if isinstance(date, datetime) else date
+
+    @staticmethod
+    def _unpack_date(date: Union[float, str]) -> float:
+        return datetime.fromisoformat(date).timestamp() if isinstance(date, str) else date
+
+    @staticmethod
+    def _check_stat(value: int) -> int:
+        # На каждую характеристику отведено 4 бита: большее или отрицательное
+        # значение испортило бы соседние характеристики
+        if not 0 <= value <= 0xF:
+            raise ValueError(f"Характеристика котика должна быть от 0 до 15, получено {value}")
+        return value
+
+    @property
+    def hunger(self) -> int:
+        return self._stats & 0xF
+
+    @hunger.setter
+    def hunger(self, value: int):
+        self._stats = self._stats & ~0xF | self._check_stat(value)
+
+    @property
+    def happiness(self) -> int:
+        return self._stats >> 4 & 0xF
+
+    @happiness.setter
+    def happiness(self, value: int):
+        self._stats = self._stats & ~0xF0 | self._check_stat(value) << 4
+
+    @property
+    def energy(self) -> int:
+        return self._stats >> 8 & 0xF
+
+    @energy.setter
+    def energy(self, value: int):
+        self._stats = self._stats & ~0xF00 | self._check_stat(value) << 8
+
+    @property
+    def created_at(self) -> datetime:
+        self._created_at = self._unpack_date(self._created_at)
+        return datetime.fromtimestamp(self._created_at)
+
     @property
     def age_days(self) -> int:
         return (datetime.now() - self.created_at).days + 1
 
+    def get_last_message(self, user_id: int) -> Optional[datetime]:
+        """Время последнего сообщения пользователя (с часовым поясом) или None."""
+        if not self._last_messages or user_id not in self._last_messages:
+            return None
+        timestamp = self._unpack_date(self._last_messages[user_id])
+        self._last_messages[user_id] = timestamp
+        return datetime.fromtimestamp(timestamp, timezone.utc)
+
+    def set_last_message(self, user_id: int, date: Union[datetime, float, str]):
+        if self._last_messages is None:
+            self._last_messages = {}
+        self._last_messages[user_id] = self._pack_date(date)
+
+    def __repr__(self) -> str:
+        return (
+            f"Cat(owner_id={self.owner_id!r}, name={self.name!r}, color={self.color!r}, "
+            f"hunger={self.hunger}, happiness={self.happiness}, energy={self.energy}, "
+            f"walk_time={self.walk_time!r}, connected_users={self.connected_users!r})"
+        )
+
+    def copy(self) -> 'Cat':
+        """Копия котика, которую можно сериализовать в другом потоке, пока оригинал меняется."""
+        cat = Cat.__new__(Cat)
+        for slot in Cat.__slots__:
+            setattr(cat, slot, getattr(self, slot))
+        # Остальные поля неизменяемые, общий только словарь сообщений
+        if self._last_messages is not None:
+            cat._last_messages = dict(self._last_messages)
+        return cat
+
     def to_dict(self) -> dict:
+        created_at = self._created_at
         return {
             'owner_id': self.owner_id,
             'name': self.name,
@@ -29,56 +162,250 @@ class Cat:
             'hunger': self.hunger,
             'happiness': self.happiness,
             'energy': self.energy,
-            'created_at': self.created_at.isoformat(),
+            'created_at': created_at if isinstance(created_at, str) else datetime.fromtimestamp(created_at).isoformat(),
             'walk_time': self.walk_time,
-            'connected_users': self.connected_users,
+            'connected_users': sorted(self.connected_users),
             'last_messages': {
-                str(user_id): date.isoformat() if isinstance(date, datetime) else date
-                for user_id, date in self.last_messages.items()
-            }
+                str(user_id): date if isinstance(date, str) else datetime.fromtimestamp(date).astimezone().isoformat()
+                for user_id, date in (self._last_messages or {}).items()
+            },
+            'stats_updated_at': self.stats_updated_at
         }
     
     @classmethod
     def from_dict(cls, data: dict) -> 'Cat':
-        data = data.copy()
-        data['created_at'] = datetime.fromisoformat(data['created_at'])
-        if 'last_messages' in data:
-            data['last_messages'] = {
-                int(user_id): datetime.fromisoformat(date) if isinstance(date, str) else date
-                for user_id, date in data['last_messages'].items()
-            }
-        return cls(**data)
+        last_messages = data.get('last_messages')
+        return cls(
+            owner_id=data['owner_id'],
+            name=data['name'],
+            color=data['color'],
+            hunger=data.get('hunger', 4),
+            happiness=data.get('happiness', 4),
+            energy=data.get('energy', 4),
+            created_at=data['created_at'],
+            walk_time=data.get('walk_time'),
+            connected_users=data.get('connected_users', ()),
+            last_messages={int(user_id): date for user_id, date in last_messages.items()} if last_messages else None,
+            # В старых данных метки нет - считаем, что характеристики актуальны на момент загрузки
+            stats_updated_at=data.get('stats_updated_at')
+        )
+
+class StatDecay:
+    """Ленивое уменьшение характеристик котика.
+    
+    Характеристики уменьшаются на 1 в каждый момент сетки с шагом period_hours
+    (отсчёт от начала эпохи), если этот момент не попадает в ночное время.
+    Вместо общего прохода по всем котикам накопленное уменьшение
+    применяется к котику при обращении к нему.
+    """
+    max_stat = 4
+    
+    def __init__(self, period_hours: float, night_start: time, night_end: time, timezone_name: str):
+        from pytz import timezone as pytz_timezone
+        self.period = period_hours * 3600
+        self.night_start = night_start
+        self.night_end = night_end
+        self.timezone = pytz_timezone(timezone_name)
+
+    @classmethod
+    def from_config(cls, config) -> 'StatDecay':
+        return cls(config.stats_decrease_hours, config.night_start, config.night_end, config.timezone)
+
+    def is_night(self, timestamp: float) -> bool:
+        local_time = datetime.fromtimestamp(timestamp, self.timezone).time()
+        return self.night_start <= local_time <= self.night_end
+
+    def count_ticks(self, since: float, until: float, limit: int = max_stat) -> int:
+        """Число дневных моментов уменьшения в промежутке (since, until], не больше limit."""
+        ticks = 0
+        tick = (since // self.period + 1) * self.period
+        while tick <= until and ticks < limit:
+            if not self.is_night(tick):
+                ticks += 1
+            tick += self.period
+        return ticks
+
+    def settle(self, cat: Cat, now: Optional[float] = None) -> bool:
+        """Применяет к котику накопленное уменьшение. Возвращает True, если что-то изменилось."""
+        now = time_module.time() if now is None else now
+        ticks = self.count_ticks(cat.stats_updated_at, now)
+        cat.stats_updated_at = now
+        if not ticks:
+            return False
+        cat.hunger = max(0, cat.hunger - ticks)
+        cat.happiness = max(0, cat.happiness - ticks)
+        cat.energy = max(0, cat.energy - ticks)
+        return True
+
+class ConnectionCodes(MutableMapping):
+    """Коды подключения: код -> (владелец, срок действия).
+    
+    Сроки действия дополнительно лежат в куче, поэтому очистка
+    просматривает только истёкшие коды, а не все подряд.
+    """
+    alphabet = string.ascii_uppercase + string.digits
+    
+    def __init__(self, codes: Optional[dict] = None):
+        self.codes: Dict[str, tuple[int, datetime]] = {}
+        self.heap: List[tuple[datetime, str]] = []
+        for code, value in (codes or {}).items():
+            self[code] = value
+
+    def __getitem__(self, code: str) -> tuple[int, datetime]:
+        return self.codes[code]
+
+    def __setitem__(self, code: str, value: tuple[int, datetime]):
+        self.codes[code] = value
+        heapq.heappush(self.heap, (value[1], code))
+        self.compact_heap()
+
+    def __delitem__(self, code: str):
+        # Запись в куче остаётся и будет пропущена, когда до неё дойдёт очередь
+        del self.codes[code]
+        self.compact_heap()
+
+    def compact_heap(self):
+        """Пересобирает кучу, если в ней накопилось больше устаревших записей, чем живых кодов."""
+        if len(self.heap) > 2 * len(self.codes) + 64:
+            self.heap = [(expires, code) for code, (_, expires) in self.codes.items()]
+            heapq.heapify(self.heap)
+
+    def __iter__(self):
+        return iter(self.codes)
+
+    def __len__(self) -> int:
+        return len(self.codes)
+
+    def allocate(self, owner_id: int, expires: datetime, length: int = 6) -> str:
+        """Выдаёт новый код, не совпадающий ни с одним действующим."""
+        while True:
+            code = ''.join(random.choices(self.alphabet, k=length))
+            if code not in self.codes:
+                self[code] = (owner_id, expires)
+                return code
+
+    def pop_expired(self, now: datetime) -> List[str]:
+        """Удаляет истёкшие коды и возвращает их список."""
+        expired = []
+        while self.heap and self.heap[0][0] < now:
+            expires, code = heapq.heappop(self.heap)
+            # Код мог быть удалён или выдан заново с другим сроком
+            if code in self.codes and self.codes[code][1] == expires:
+                del self[code]
+                expired.append(code)
+        return expired
 
 class Storage:
-    def __init__(self, file_path: str = 'data.json'):
+    def __init__(
+        self,
+        file_path: str = 'data.json',
+        journal: bool = False,
+        compact_every: int = 1000,
+        write_behind: bool = False,
+        flush_interval: float = 5.0,
+        flush_after: int = 100,
+        decay: Optional[StatDecay] = None
+    ):
         self.file_path = file_path
+        self.decay = decay
+        # В режиме журнала изменения дописываются в data.json.journal,
+        # а полный снимок переписывается только при компактизации
+        self.journal = journal
+        self.journal_path = f"{file_path}.journal"
+        self.compact_every = compact_every
+        self.journal_records = 0
+        
+        # В режиме отложенной записи изменения только помечаются,
+        # а на диск их сбрасывает фоновая задача run_flusher
+        self.write_behind = write_behind
+        self.flush_interval = flush_interval
+        self.flush_after = flush_after
+        self.dirty_cats: Set[int] = set()
+        self.dirty_codes: Set[str] = set()
+        self.snapshot_requested = False
+        self.pending_marks = 0
+        # Копии котиков для фоновых снимков: между снимками обновляются только изменённые
+        self.cat_copies: Optional[Dict[int, Cat]] = None
+        self.flush_event: Optional[asyncio.Event] = None
+        self.write_lock = threading.Lock()
+        self.stats = {
+            'marks': 0,           # Сколько раз данные помечались изменёнными
+            'flushes': 0,         # Сколько было записей на диск
+            'flush_seconds': 0.0, # Суммарное время записи
+            'max_flush_seconds': 0.0,
+            'last_flush_seconds': 0.0
+        }
         self.cats: Dict[int, Cat] = {}
-        self.connection_codes: Dict[str, tuple[int, datetime]] = {}
+        self.connection_codes = ConnectionCodes()
+        # Обратный индекс: подключенный пользователь -> владелец котика
+        self.user_owners: Dict[int, int] = {}
+        
+        started = time_module.perf_counter()
         self.load()
+        self.load_stats = {
+            'seconds': time_module.perf_counter() - started,
+            'cats': len(self.cats),
+            'peak_rss_mb': peak_rss_mb()
+        }
+
+    def get_cat(self, owner_id: int) -> Cat:
+        """Возвращает котика с актуальными характеристиками.
+        
+        Результат уменьшения полностью определяется сохранёнными значениями
+        и меткой stats_updated_at, поэтому записывать его сразу не нужно -
+        он попадёт на диск вместе со следующим изменением котика.
+        """
+        cat = self.cats[owner_id]
+        if self.decay is not None:
+            self.decay.settle(cat)
+        return cat
+
+    def find_owner(self, user_id: int) -> Optional[int]:
+        """Возвращает id владельца котика, к которому относится пользователь."""
+        if user_id in self.cats:
+            return user_id
+        return self.user_owners.get(user_id)
+
+    def add_cat(self, cat: Cat):
+        self.cats[cat.owner_id] = cat
+        for user_id in cat.connected_users:
+            self.user_owners[user_id] = cat.owner_id
+
+    def connect_user(self, owner_id: int, user_id: int) -> bool:
+        """Подключает пользователя к котику. Возвращает False, если он уже подключен."""
+        cat = self.cats[owner_id]
+        if user_id in cat.connected_users:
+            return False
+        cat.connected_users += (user_id,)
+        self.user_owners[user_id] = owner_id
+        return True
+
+    def rebuild_index(self):
+        self.user_owners = {
+            user_id: owner_id
+            for owner_id, cat in self.cats.items()
+            for user_id in cat.connected_users
+        }
     
     def load(self):
+        self.load_snapshot()
+        if self.journal and os.path.exists(self.journal_path):
+            self.replay_journal()
+            # Сворачиваем журнал в снимок, чтобы он не рос между перезапусками
+            self.write_snapshot(self.to_dict())
+        self.rebuild_index()
+
+    def load_snapshot(self):
         if not os.path.exists(self.file_path):
             self.cats = {}
-            self.connection_codes = {}
+            self.connection_codes = ConnectionCodes()
             return
         
         try:
-            with open(self.file_path, 'r', encoding='utf-8') as f:
-                data = json.load(f)
-            
-            self.cats = {
-                int(owner_id): Cat.from_dict(cat_data) 
-                for owner_id, cat_data in data.get('cats', {}).items()
-            }
-            
-            # Загружаем коды подключения, преобразуя строки дат обратно в datetime
-            self.connection_codes = {
-                code: (int(owner_id), datetime.fromisoformat(expires))
-                for code, (owner_id, expires) in data.get('connection_codes', {}).items()
-            }
+            self.cats, self.connection_codes = self.read_snapshot(self.file_path)
             
         except json.JSONDecodeError:
-            print("Ошибка чте��ия JSON файла!")
+            print("Ошибка чтения JSON файла!")
             # Создаём резервную копию файла
             backup_name = f"{self.file_path}.backup"
             try:
@@ -92,7 +419,7 @@ class Storage:
             if not hasattr(self, 'cats'):
                 self.cats = {}
             if not hasattr(self, 'connection_codes'):
-                self.connection_codes = {}
+                self.connection_codes = ConnectionCodes()
             
         except Exception as e:
             print(f"Неожиданная ошибка при загрузке данных: {e}")
@@ -100,10 +427,123 @@ class Storage:
             if not hasattr(self, 'cats'):
                 self.cats = {}
             if not hasattr(self, 'connection_codes'):
-                self.connection_codes = {}
-    
-    def save(self):
-        data = {
+                self.connection_codes = ConnectionCodes()
+
+    @staticmethod
+    def read_snapshot(file_path: str) -> tuple[Dict[int, Cat], ConnectionCodes]:
+        # Разбираем файл по одной записи, чтобы целиком он в памяти не лежал
+        cats = {}
+        connection_codes = ConnectionCodes()
+        for section, key, value in iter_sections(file_path, ('cats', 'connection_codes')):
+            if section == 'cats':
+                cats[int(key)] = Cat.from_dict(value)
+            else:
+                # Коды подключения: строку даты преобразуем обратно в datetime
+                owner_id, expires = value
+                connection_codes[key] = (int(owner_id), datetime.fromisoformat(expires))
+        return cats, connection_codes
+
+    def replay_journal(self):
+        """Применяет к снимку записи журнала по порядку."""
+        with open(self.journal_path, 'r', encoding='utf-8') as f:
+            lines = f.readlines()
+        
+        for number, line in enumerate(lines, 1):
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                # Оборванная последняя запись - процесс упал посреди дозаписи
+                if number == len(lines):
+                    print("Последняя запись журнала повреждена и пропущена")
+                    break
+                raise
+            self.apply_record(record)
+
+    def apply_record(self, record: dict):
+        match record['op']:
+            case 'cat':
+                self.cats[record['id']] = Cat.from_dict(record['data'])
+            case 'del_cat':
+                self.cats.pop(record['id'], None)
+            case 'code':
+                owner_id, expires = record['data']
+                self.connection_codes[record['id']] = (owner_id, datetime.fromisoformat(expires))
+            case 'del_code':
+                self.connection_codes.pop(record['id'], None)
+
+    def append_records(self, records: list):
+        with open(self.journal_path, 'a', encoding='utf-8') as f:
+            f.writelines(
+                json.dumps(record, ensure_ascii=False, separators=(',', ':')) + '\n'
+                for record in records
+            )
+
+    def cat_record(self, owner_id: int) -> dict:
+        cat = self.cats.get(owner_id)
+        if cat is None:
+            return {'op': 'del_cat', 'id': owner_id}
+        return {'op': 'cat', 'id': owner_id, 'data': cat.to_dict()}
+
+    def code_record(self, code: str) -> dict:
+        if code not in self.connection_codes:
+            return {'op': 'del_code', 'id': code}
+        owner_id, expires = self.connection_codes[code]
+        return {'op': 'code', 'id': code, 'data': (owner_id, expires.isoformat())}
+
+    def write_records(self, records: list):
+        if self.journal_records + len(records) >= self.compact_every:
+            self.save()
+            return
+        self.append_records(records)
+        self.journal_records += len(records)
+
+    def save_cat(self, owner_id: int):
+        """Сохраняет изменения одного котика."""
+        self.save_cats([owner_id])
+
+    def save_cats(self, owner_ids: List[int]):
+        """Сохраняет изменения нескольких котиков одной записью."""
+        if not owner_ids:
+            return
+        if self.write_behind:
+            self.dirty_cats.update(owner_ids)
+            self.mark_dirty()
+        elif self.journal:
+            self.write_records([self.cat_record(owner_id) for owner_id in owner_ids])
+        else:
+            self.save()
+
+    def save_code(self, code: str):
+        """Сохраняет добавление или удаление кода подключения."""
+        self.save_codes([code])
+
+    def remove_expired_codes(self, now: datetime) -> List[str]:
+        """Удаляет истёкшие коды подключения, сохраняет изменение и возвращает удалённые коды."""
+        expired = self.connection_codes.pop_expired(now)
+        self.save_codes(expired)
+        return expired
+
+    def walk_times(self, start: str = '00:00', end: str = '23:59') -> List[Tuple[int, str]]:
+        """Пары (владелец, время прогулки) для котиков со временем прогулки в промежутке [start, end]."""
+        return [
+            (owner_id, cat.walk_time)
+            for owner_id, cat in self.cats.items()
+            if cat.walk_time and start <= cat.walk_time <= end
+        ]
+
+    def save_codes(self, codes: List[str]):
+        if not codes:
+            return
+        if self.write_behind:
+            self.dirty_codes.update(codes)
+            self.mark_dirty()
+        elif self.journal:
+            self.write_records([self.code_record(code) for code in codes])
+        else:
+            self.save()
+
+    def to_dict(self) -> dict:
+        return {
             'cats': {
                 str(owner_id): cat.to_dict()
                 for owner_id, cat in self.cats.items()
@@ -114,5 +554,212 @@ class Storage:
                 if isinstance(expires, datetime)  # Проверяем, что expires это datetime
             }
         }
-        with open(self.file_path, 'w', encoding='utf-8') as f:
-            json.dump(data, f, ensure_ascii=False, indent=2) 
\ No newline at end of file
+    
+    def save(self):
+        """Записывает полный снимок данных. В режиме журнала заодно очищает журнал."""
+        if self.write_behind:
+            self.snapshot_requested = True
+            self.mark_dirty()
+            return
+        self.write_snapshot(self.to_dict())
+        self.journal_records = 0
+
+    def write_snapshot(self, data: dict):
+        write_json_atomic(self.file_path, data)
+        
+        # Журнал обнуляем только после того, как снимок на месте: записи
+        # журнала идемпотентны, поэтому повторное применение безопасно
+        if self.journal:
+            open(self.journal_path, 'w').close()
+
+    def mark_dirty(self):
+        self.stats['marks'] += 1
+        self.pending_marks += 1
+        if self.flush_event is not None and self.pending_marks >= self.flush_after:
+            self.flush_event.set()
+
+    def collect_changes(self) -> Optional[tuple]:
+        """Забирает накопленные изменения и готовит их к записи.
+        
+        Вызывается в потоке цикла событий, пока данные никто не меняет.
+        """
+        if not (self.dirty_cats or self.dirty_codes or self.snapshot_requested):
+            return None
+        
+        records = [self.cat_record(owner_id) for owner_id in self.dirty_cats]
+        records += [self.code_record(code) for code in self.dirty_codes]
+        
+        if (
+            not self.journal
+            or self.snapshot_requested
+            or self.journal_records + len(records) >= self.compact_every
+        ):
+            changes = ('snapshot', self.snapshot_copies())
+            self.journal_records = 0
+        else:
+            changes = ('journal', records)
+            self.journal_records += len(records)
+            if self.cat_copies is not None:
+                self.update_cat_copies()
+        
+        self.dirty_cats = set()
+        self.dirty_codes = set()
+        self.snapshot_requested = False
+        self.pending_marks = 0
+        return changes
+
+    def update_cat_copies(self):
+        for owner_id in self.dirty_cats:
+            cat = self.cats.get(owner_id)
+            if cat is None:
+                self.cat_copies.pop(owner_id, None)
+            else:
+                self.cat_copies[owner_id] = cat.copy()
+
+    def snapshot_copies(self) -> tuple:
+        """Данные для снимка, которые фоновый поток превратит в to_dict().
+        
+        Сериализация всех котиков в цикле событий задерживала бы обработчики,
+        поэтому здесь только копируются изменённые с прошлого снимка котики
+        и коды подключения, которых немного.
+        """
+        if self.cat_copies is None or self.snapshot_requested:
+            # После неудачной записи копии могли отстать, поэтому собираем их заново
+            self.cat_copies = {owner_id: cat.copy() for owner_id, cat in self.cats.items()}
+        else:
+            self.update_cat_copies()
+        codes = {
+            code: (owner_id, expires.isoformat())
+            for code, (owner_id, expires) in self.connection_codes.items()
+            if isinstance(expires, datetime)
+        }
+        return dict(self.cat_copies), codes
+
+    def write_changes(self, changes: tuple):
+        """Записывает подготовленные изменения на диск. Безопасно вызывать из другого потока."""
+        kind, payload = changes
+        started = time_module.perf_counter()
+        with self.write_lock:
+            self.write_payload(kind, payload)
+        
+        elapsed = time_module.perf_counter() - started
+        self.stats['flushes'] += 1
+        self.stats['flush_seconds'] += elapsed
+        self.stats['last_flush_seconds'] = elapsed
+        self.stats['max_flush_seconds'] = max(self.stats['max_flush_seconds'], elapsed)
+
+    def write_payload(self, kind: str, payload):
+        if kind == 'snapshot':
+            cats, codes = payload
+            self.write_snapshot({
+                'cats': {str(owner_id): cat.to_dict() for owner_id, cat in cats.items()},
+                'connection_codes': codes
+            })
+        else:
+            self.append_records(payload)
+
+    def write_failed(self):
+        """Запись не удалась, а изменения уже забраны из dirty_cats и dirty_codes.
+        
+        Какие из них успели попасть на диск, неизвестно, поэтому следующий
+        сброс записывает полный снимок - он заодно обнуляет счётчик журнала.
+        """
+        self.snapshot_requested = True
+        self.pending_marks += 1
+
+    def flush(self):
+        """Синхронно сбрасывает накопленные изменения (например, при остановке бота)."""
+        changes = self.collect_changes()
+        if changes is None:
+            return
+        try:
+            self.write_changes(changes)
+        except Exception:
+            self.write_failed()
+            raise
+
+    async def flush_async(self):
+        changes = self.collect_changes()
+        if changes is None:
+            return
+        write = asyncio.ensure_future(asyncio.to_thread(self.write_changes, changes))
+        try:
+            await asyncio.shield(write)
+        except asyncio.CancelledError:
+            # Поток записи отменой не остановить: дожидаемся его, чтобы
+            # следующий flush при остановке бота не писал одновременно с ним
+            await asyncio.wait([write])
+            if not write.cancelled() and write.exception() is not None:
+                self.write_failed()
+            raise
+        except Exception:
+            self.write_failed()
+            raise
+
+    async def run_flusher(self):
+        """Фоновая задача: сбрасывает изменения раз в flush_interval секунд
+        или сразу, как только накопилось flush_after изменений."""
+        self.flush_event = asyncio.Event()
+        try:
+            while True:
+                try:
+                    await asyncio.wait_for(self.flush_event.wait(), self.flush_interval)
+                except asyncio.TimeoutError:
+                    pass
+                self.flush_event.clear()
+                try:
+                    await self.flush_async()
+                except Exception as e:
+                    print(f"Ошибка при сохранении данных: {e}")
+        finally:
+            self.flush_event = None
+
+    def close(self):
+        pass
+
+    def flush_stats(self) -> dict:
+        """Задержка записи и коэффициент склейки изменений для настройки режима."""
+        flushes = self.stats['flushes']
+        return {
+            **self.stats,
+            'avg_flush_seconds': self.stats['flush_seconds'] / flushes if flushes else 0.0,
+            'coalescing_ratio': self.stats['marks'] / flushes if flushes else 0.0
+        }
+
+
+def create_storage(config) -> Storage:
+    """Создаёт хранилище с бэкендом, выбранным в конфигурации."""
+    if config.storage_backend == 'sqlite':
+        from sqlite_storage import SqliteStorage
+        return SqliteStorage(
+            config.storage_path,
+            write_behind=config.storage_write_behind,
+            flush_interval=config.storage_flush_interval,
+            flush_after=config.storage_flush_after,
+            decay=StatDecay.from_config(config)
+        )
+    
+    # Число шардов в настройках должно совпадать с раскладкой данных на диске
+    from sharded_storage import check_shard_count
+    check_shard_count(config.storage_path, config.storage_shards)
+    
+    if config.storage_shards > 1:
+        from sharded_storage import ShardedStorage
+        return ShardedStorage(
+            config.storage_path,
+            shards=config.storage_shards,
+            write_behind=config.storage_write_behind,
+            flush_interval=config.storage_flush_interval,
+            flush_after=config.storage_flush_after,
+            decay=StatDecay.from_config(config)
+        )
+    
+    return Storage(
+        config.storage_path,
+        journal=config.storage_journal,
+        compact_every=config.storage_compact_every,
+        write_behind=config.storage_write_behind,
+        flush_interval=config.storage_flush_interval,
+        flush_after=config.storage_flush_after,
+        decay=StatDecay.from_config(config)
+    )
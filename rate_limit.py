@@ -0,0 +1,62 @@
+import asyncio
+import time
+from typing import Dict
+
+
+class TokenBucket:
+    """Ограничение числа операций в секунду для асинхронного кода.
+
+    Ведро пополняется со скоростью rate токенов в секунду и вмещает не больше
+    capacity. pause() останавливает выдачу токенов - например, когда Telegram
+    ответил RetryAfter.
+    """
+
+    def __init__(self, rate: float, capacity: float = None):
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else rate
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.paused_until = 0.0
+        self.lock = asyncio.Lock()
+
+    async def acquire(self):
+        # Ожидающие получают токены по очереди
+        async with self.lock:
+            while True:
+                now = time.monotonic()
+                if now < self.paused_until:
+                    await asyncio.sleep(self.paused_until - now)
+                    continue
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+    def pause(self, seconds: float):
+        self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+
+
+class ChatLimiter:
+    """Минимальный интервал между сообщениями в один и тот же чат."""
+
+    def __init__(self, interval: float = 1.0):
+        self.interval = interval
+        self.next_allowed: Dict[int, float] = {}
+
+    async def acquire(self, chat_id: int):
+        now = time.monotonic()
+        allowed = self.next_allowed.get(chat_id, 0.0)
+        # Место в очереди чата занимаем сразу, чтобы параллельные отправки в него шли по порядку
+        self.next_allowed[chat_id] = max(now, allowed) + self.interval
+        if allowed > now:
+            await asyncio.sleep(allowed - now)
+
+    def pause(self, chat_id: int, seconds: float):
+        self.next_allowed[chat_id] = max(self.next_allowed.get(chat_id, 0.0), time.monotonic() + seconds)
+
+    def prune(self):
+        """Забывает чаты, в которые можно писать уже сейчас."""
+        now = time.monotonic()
+        self.next_allowed = {chat_id: at for chat_id, at in self.next_allowed.items() if at > now}
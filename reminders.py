@@ -0,0 +1,159 @@
+import asyncio
+import logging
+import time
+from datetime import datetime
+from typing import Awaitable, Callable, Dict, Iterable, List, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Напоминания о прогулке: за сколько минут до неё они приходят
+WALK_OFFSETS = (60, 30, 10, 0)
+
+
+class Reminder:
+    """Напоминание для одного котика: время прогулки и следующий этап.
+
+    Одна запись на котика независимо от числа этапов и получателей -
+    получатели определяются в момент срабатывания.
+    """
+    __slots__ = ('owner_id', 'walk_minute', 'stage', 'due_minute')
+
+    def __init__(self, owner_id: int, walk_minute: int, stage: int, due_minute: int):
+        self.owner_id = owner_id
+        self.walk_minute = walk_minute
+        self.stage = stage
+        self.due_minute = due_minute
+
+
+class ReminderWheel:
+    """Колесо таймеров с ячейкой на каждую минуту.
+
+    Время хранится в минутах от начала эпохи, ячейка - это минута по модулю
+    числа ячеек. Добавление и отмена по owner_id стоят O(1), а каждый тик
+    смотрит только в ячейку текущей минуты.
+    """
+
+    def __init__(self, offsets: Tuple[int, ...] = WALK_OFFSETS, slots: int = 1440, period: int = 1440):
+        self.offsets = offsets
+        self.slots = slots
+        self.period = period  # Через сколько минут прогулка повторяется (0 - один раз)
+        self.buckets: List[Dict[int, Reminder]] = [{} for _ in range(slots)]
+        self.reminders: Dict[int, Reminder] = {}
+        self.current_minute = self.minute_of(time.time())
+        self.fired = 0
+
+    @staticmethod
+    def minute_of(timestamp: float) -> int:
+        return int(timestamp // 60)
+
+    def __len__(self) -> int:
+        return len(self.reminders)
+
+    def __contains__(self, owner_id: int) -> bool:
+        return owner_id in self.reminders
+
+    def schedule(self, owner_id: int, walk_at: datetime):
+        """Ставит (или переставляет) напоминания о прогулке котика на walk_at."""
+        self.cancel(owner_id)
+        first = self.first_due(self.minute_of(walk_at.timestamp()))
+        if first is not None:
+            self.insert(Reminder(owner_id, *first))
+
+    def first_due(self, walk_minute: int):
+        """Первый ещё не наступивший этап: (минута прогулки, этап, минута срабатывания)."""
+        while True:
+            # Этапы, время которых уже прошло, пропускаем
+            for stage, offset in enumerate(self.offsets):
+                due_minute = walk_minute - offset
+                if due_minute > self.current_minute:
+                    return walk_minute, stage, due_minute
+            if not self.period:
+                return None
+            walk_minute += self.period
+
+    def rebuild(self, walks: Iterable[Tuple[int, int]]):
+        """Заново заполняет колесо из пар (owner_id, минута прогулки от начала эпохи).
+
+        Этапы считаются один раз на каждое различное время прогулки, а не на котика,
+        поэтому восстановление десятков тысяч напоминаний занимает миллисекунды.
+        """
+        self.buckets = [{} for _ in range(self.slots)]
+        self.reminders = {}
+        reminders = self.reminders
+        buckets = self.buckets
+        slots = self.slots
+        firsts = {}
+        for owner_id, walk_minute in walks:
+            first = firsts.get(walk_minute)
+            if first is None:
+                first = firsts[walk_minute] = self.first_due(walk_minute)
+                if first is None:
+                    continue
+            reminder = Reminder(owner_id, *first)
+            reminders[owner_id] = reminder
+            buckets[first[2] % slots][owner_id] = reminder
+
+    def insert(self, reminder: Reminder):
+        self.reminders[reminder.owner_id] = reminder
+        self.buckets[reminder.due_minute % self.slots][reminder.owner_id] = reminder
+
+    def cancel(self, owner_id: int) -> bool:
+        reminder = self.reminders.pop(owner_id, None)
+        if reminder is None:
+            return False
+        del self.buckets[reminder.due_minute % self.slots][owner_id]
+        return True
+
+    def advance(self, now_minute: int) -> List[Tuple[int, int]]:
+        """Прокручивает колесо до now_minute включительно.
+
+        Возвращает сработавшие напоминания как (owner_id, минут до прогулки)
+        и переставляет каждое на следующий этап.
+        """
+        fired = []
+        # Если тик запоздал, проходим пропущенные минуты, но не больше одного оборота
+        start = max(self.current_minute + 1, now_minute - self.slots + 1)
+        for minute in range(start, now_minute + 1):
+            bucket = self.buckets[minute % self.slots]
+            if not bucket:
+                continue
+            # В ячейке могут лежать и записи следующих оборотов
+            ready = [reminder for reminder in bucket.values() if reminder.due_minute <= minute]
+            for reminder in ready:
+                del bucket[reminder.owner_id]
+                del self.reminders[reminder.owner_id]
+                # После долгой паузы отправляем только самый свежий из пропущенных этапов
+                while (reminder.stage + 1 < len(self.offsets)
+                       and reminder.walk_minute - self.offsets[reminder.stage + 1] <= now_minute):
+                    reminder.stage += 1
+                fired.append((reminder.owner_id, self.offsets[reminder.stage]))
+                self.reschedule(reminder)
+        self.current_minute = max(self.current_minute, now_minute)
+        self.fired += len(fired)
+        return fired
+
+    def reschedule(self, reminder: Reminder):
+        if reminder.stage + 1 < len(self.offsets):
+            reminder.stage += 1
+        elif self.period:
+            # Последний этап прошёл - переходим к прогулке следующего дня
+            reminder.stage = 0
+            reminder.walk_minute += self.period
+        else:
+            return
+        reminder.due_minute = reminder.walk_minute - self.offsets[reminder.stage]
+        self.insert(reminder)
+
+    async def run(self, fire: Callable[[int, int], Awaitable[None]]):
+        """Тикает раз в минуту и вызывает fire(owner_id, минут до прогулки) для сработавших."""
+        while True:
+            # Спим до начала следующей минуты
+            await asyncio.sleep(60 - time.time() % 60)
+            for owner_id, minutes_before in self.advance(self.minute_of(time.time())):
+                try:
+                    await fire(owner_id, minutes_before)
+                except Exception as e:
+                    logger.error(f"Ошибка напоминания о прогулке котика {owner_id}: {e}")
+
+    def stats(self) -> dict:
+        return {'reminders': len(self.reminders), 'fired': self.fired}
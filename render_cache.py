@@ -0,0 +1,104 @@
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future
+from typing import Callable, Dict, Hashable, Optional, Tuple
+
+
+class RenderCache:
+    """LRU-кэш готовых картинок, ограниченный суммарным размером в байтах.
+
+    Если картинку с тем же ключом уже кто-то рисует, повторный запрос
+    не рисует её заново, а дожидается результата первого.
+    """
+
+    def __init__(self, max_bytes: int = 32 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self.entries: OrderedDict[Hashable, bytes] = OrderedDict()
+        self.in_flight: Dict[Hashable, Future] = {}
+        self.size = 0
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.shared = 0           # Запросы, дождавшиеся чужой отрисовки
+        self.evictions = 0
+        self.evicted_bytes = 0
+
+    def get_or_render(self, key: Hashable, render: Callable[[], bytes]) -> bytes:
+        data, future, owner = self.begin(key)
+        if data is not None:
+            return data
+        if not owner:
+            return future.result()
+
+        try:
+            data = render()
+        except BaseException as e:
+            self.finish(key, error=e)
+            raise
+        self.finish(key, data)
+        return data
+
+    def begin(self, key: Hashable) -> Tuple[Optional[bytes], Optional[Future], bool]:
+        """Начинает получение картинки: (готовые данные, future отрисовки, рисовать ли самому).
+
+        Если картинки нет в кэше и её никто не рисует, вызывающий становится
+        владельцем отрисовки и обязан завершить её через finish.
+        """
+        with self.lock:
+            data = self.entries.get(key)
+            if data is not None:
+                self.entries.move_to_end(key)
+                self.hits += 1
+                return data, None, False
+            future = self.in_flight.get(key)
+            if future is not None:
+                self.shared += 1
+                return None, future, False
+            future = self.in_flight[key] = Future()
+            self.misses += 1
+            return None, future, True
+
+    def finish(self, key: Hashable, data: Optional[bytes] = None, error: Optional[BaseException] = None):
+        """Завершает отрисовку, начатую begin: сохраняет результат и будит ожидающих."""
+        with self.lock:
+            future = self.in_flight.pop(key)
+            if error is None:
+                self.put(key, data)
+        if error is None:
+            future.set_result(data)
+        else:
+            future.set_exception(error)
+
+    def put(self, key: Hashable, data: bytes):
+        # Вызывается под self.lock
+        if len(data) > self.max_bytes:
+            return
+        if key in self.entries:
+            self.size -= len(self.entries.pop(key))
+        self.entries[key] = data
+        self.size += len(data)
+        while self.size > self.max_bytes:
+            _, evicted = self.entries.popitem(last=False)
+            self.size -= len(evicted)
+            self.evictions += 1
+            self.evicted_bytes += len(evicted)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.size = 0
+
+    def stats(self) -> dict:
+        with self.lock:
+            requests = self.hits + self.misses + self.shared
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'shared': self.shared,
+                'hit_ratio': (self.hits + self.shared) / requests if requests else 0.0,
+                'entries': len(self.entries),
+                'bytes': self.size,
+                'max_bytes': self.max_bytes,
+                'evictions': self.evictions,
+                'evicted_bytes': self.evicted_bytes
+            }
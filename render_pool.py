@@ -0,0 +1,111 @@
+import asyncio
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import List, Optional
+
+from image_generator import ImageGenerator
+
+# Генератор внутри процесса-исполнителя: фоны и шрифты грузятся один раз на процесс
+worker_generator: Optional[ImageGenerator] = None
+
+
+def init_worker(settings: dict):
+    global worker_generator
+    worker_generator = ImageGenerator(cache_max_bytes=0, **settings)
+
+
+def render_in_worker(color, name, hunger, happiness, energy, age_days) -> bytes:
+    return worker_generator.encode_status(color, name, hunger, happiness, energy, age_days)
+
+
+class RenderQueueFull(Exception):
+    """Очередь отрисовки заполнена: запрос отклонён, чтобы не копить задержку."""
+
+
+class AsyncRenderer:
+    """Асинхронная отрисовка картинок статуса вне цикла событий.
+
+    Отрисовка идёт в пуле процессов или потоков. Запросы ждут в очереди
+    не длиннее max_pending, а пул разбирают workers задач - по одной на
+    исполнителя. Запрос картинки, которая уже в очереди или рисуется,
+    присоединяется к ней (это делает RenderCache), а новый запрос при полной
+    очереди сразу отклоняется с RenderQueueFull. При workers=0 рисуем
+    прямо в обработчике, как раньше.
+    """
+
+    def __init__(self, generator: ImageGenerator, workers: int = 0, kind: str = 'process', max_pending: int = 32):
+        self.generator = generator
+        self.workers = workers
+        self.kind = kind
+        self.max_pending = max_pending
+        self.executor: Optional[Executor] = None
+        if workers > 0:
+            if kind == 'process':
+                self.executor = ProcessPoolExecutor(
+                    max_workers=workers,
+                    initializer=init_worker,
+                    initargs=(generator.encode_settings(),)
+                )
+            else:
+                self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='render')
+        # Очередь и задачи создаются при первом запросе, уже внутри цикла событий
+        self.queue: Optional[asyncio.Queue] = None
+        self.tasks: List[asyncio.Task] = []
+        self.rejected = 0
+
+    async def render_status(self, color, name, hunger, happiness, energy, age_days) -> bytes:
+        args = (color, name, hunger, happiness, energy, age_days)
+        if self.executor is None:
+            return self.generator.render_status(*args)
+
+        key = self.generator.status_key(*args)
+        cache = self.generator.cache
+        data, future, owner = cache.begin(key)
+        if data is not None:
+            return data
+        if owner:
+            if self.queue is None:
+                self.start()
+            if self.queue.full():
+                self.rejected += 1
+                cache.finish(key, error=RenderQueueFull(f"В очереди отрисовки уже {self.max_pending} картинок"))
+            else:
+                self.queue.put_nowait((key, args))
+        # Отмена одного ожидающего не должна отменять отрисовку для остальных
+        return await asyncio.shield(asyncio.wrap_future(future))
+
+    def start(self):
+        self.queue = asyncio.Queue(maxsize=self.max_pending)
+        self.tasks = [asyncio.create_task(self.worker()) for _ in range(self.workers)]
+
+    async def worker(self):
+        loop = asyncio.get_running_loop()
+        cache = self.generator.cache
+        while True:
+            key, args = await self.queue.get()
+            try:
+                if self.kind == 'process':
+                    data = await loop.run_in_executor(self.executor, render_in_worker, *args)
+                else:
+                    data = await loop.run_in_executor(self.executor, self.generator.encode_status, *args)
+            except asyncio.CancelledError as e:
+                cache.finish(key, error=e)
+                raise
+            except Exception as e:
+                cache.finish(key, error=e)
+            else:
+                cache.finish(key, data)
+            finally:
+                self.queue.task_done()
+
+    def stats(self) -> dict:
+        return {
+            'queued': self.queue.qsize() if self.queue is not None else 0,
+            'max_pending': self.max_pending,
+            'rejected': self.rejected
+        }
+
+    def close(self):
+        for task in self.tasks:
+            task.cancel()
+        if self.executor is not None:
+            self.executor.shutdown(wait=False, cancel_futures=True)
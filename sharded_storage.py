@@ -0,0 +1,225 @@
+import json
+import logging
+import os
+import shutil
+import sys
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterable, List, Optional, Set
+
+from models import Storage, Cat, ConnectionCodes, StatDecay, write_json_atomic
+
+logger = logging.getLogger(__name__)
+
+
+def shard_path(file_path: str, index: int, shards: int) -> str:
+    """data.json -> data.shard003-of008.json"""
+    root, ext = os.path.splitext(file_path)
+    return f"{root}.shard{index:03d}-of{shards:03d}{ext}"
+
+
+def shard_count_path(file_path: str) -> str:
+    """data.json -> data.shards.json (число шардов, на которое разложены данные)"""
+    root, ext = os.path.splitext(file_path)
+    return f"{root}.shards{ext}"
+
+
+def read_shard_count(file_path: str) -> int:
+    """Число шардов, на которое разложены данные (1 - единый файл)."""
+    path = shard_count_path(file_path)
+    if not os.path.exists(path):
+        return 1
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)['shards']
+
+
+def write_shard_count(file_path: str, shards: int):
+    path = shard_count_path(file_path)
+    if shards == 1:
+        if os.path.exists(path):
+            os.remove(path)
+        return
+    write_json_atomic(path, {'shards': shards})
+
+
+def check_shard_count(file_path: str, shards: int) -> int:
+    """Не даёт запуститься с числом шардов, отличным от раскладки на диске.
+
+    Иначе бот молча прочитал бы старый data.json или пустые шарды другой раскладки.
+    Единый файл при первом запуске с шардами раскладывается автоматически,
+    поэтому этот случай разрешён. Возвращает число шардов на диске.
+    """
+    stored = read_shard_count(file_path)
+    if stored != shards and not (stored == 1 and shards > 1):
+        raise ValueError(
+            f"Данные разложены на {stored} шард(ов), а в настройках STORAGE_SHARDS={shards}. "
+            f"Переложите их командой python -m tools.reshard --from-shards {stored} --to-shards {shards} {file_path}"
+        )
+    return stored
+
+
+def cat_shard(owner_id: int, shards: int) -> int:
+    return owner_id % shards
+
+
+def code_shard(code: str, shards: int) -> int:
+    # У удалённого кода владельца уже не узнать, поэтому делим коды по самому коду
+    return zlib.crc32(code.encode()) % shards
+
+
+class ShardedCodes(ConnectionCodes):
+    """Коды подключения, которые дополнительно помнят, какие коды лежат в каком шарде."""
+
+    def __init__(self, shards: int, codes: Optional[dict] = None):
+        self.shards = shards
+        self.shard_codes: List[Set[str]] = [set() for _ in range(shards)]
+        super().__init__(codes)
+
+    def __setitem__(self, code: str, value: tuple):
+        super().__setitem__(code, value)
+        self.shard_codes[code_shard(code, self.shards)].add(code)
+
+    def __delitem__(self, code: str):
+        super().__delitem__(code)
+        self.shard_codes[code_shard(code, self.shards)].discard(code)
+
+
+def split_snapshot(data: dict, shards: int) -> List[dict]:
+    """Раскладывает полный снимок (формат Storage.to_dict) по шардам."""
+    parts = [{'cats': {}, 'connection_codes': {}} for _ in range(shards)]
+    for owner_id, cat_data in data['cats'].items():
+        parts[cat_shard(int(owner_id), shards)]['cats'][owner_id] = cat_data
+    for code, value in data['connection_codes'].items():
+        parts[code_shard(code, shards)]['connection_codes'][code] = value
+    return parts
+
+
+class ShardedStorage(Storage):
+    """Хранилище, разложенное по нескольким JSON-файлам.
+
+    Котики делятся по owner_id, коды подключения - по самому коду.
+    Изменение перезаписывает только свой шард, а при запуске шарды
+    читаются параллельно.
+    """
+
+    def __init__(self, file_path: str = 'data.json', shards: int = 4, write_behind: bool = False,
+                 flush_interval: float = 5.0, flush_after: int = 100,
+                 decay: Optional[StatDecay] = None):
+        self.shards = shards
+        self.shard_members: List[Set[int]] = [set() for _ in range(shards)]
+        # Как и в SQLite, изменения идут по пути записей журнала,
+        # но каждая запись приводит к перезаписи только своего шарда
+        super().__init__(
+            file_path,
+            journal=True,
+            compact_every=sys.maxsize,
+            write_behind=write_behind,
+            flush_interval=flush_interval,
+            flush_after=flush_after,
+            decay=decay
+        )
+
+    def shard_path(self, index: int) -> str:
+        return shard_path(self.file_path, index, self.shards)
+
+    def add_cat(self, cat: Cat):
+        super().add_cat(cat)
+        self.shard_members[cat_shard(cat.owner_id, self.shards)].add(cat.owner_id)
+
+    def load(self):
+        if check_shard_count(self.file_path, self.shards) == 1:
+            # Первый запуск с шардами: берём данные из единого файла и раскладываем их
+            self.load_snapshot()
+            self.connection_codes = ShardedCodes(self.shards, self.connection_codes.codes)
+            self.rebuild_shards()
+            self.write_snapshot(self.to_dict())
+            write_shard_count(self.file_path, self.shards)
+            self.rebuild_index()
+            return
+        
+        with ThreadPoolExecutor(max_workers=self.shards) as pool:
+            parts = list(pool.map(self.load_shard, range(self.shards)))
+        self.cats = {}
+        self.connection_codes = ShardedCodes(self.shards)
+        for cats, connection_codes in parts:
+            self.cats.update(cats)
+            self.connection_codes.update(connection_codes)
+        self.rebuild_shards()
+        self.rebuild_index()
+
+    def load_shard(self, index: int) -> tuple[Dict[int, Cat], ConnectionCodes]:
+        path = self.shard_path(index)
+        if not os.path.exists(path):
+            return {}, ConnectionCodes()
+        try:
+            return self.read_snapshot(path)
+        except Exception as e:
+            logger.error(f"Ошибка чтения шарда {path}: {e}")
+            try:
+                shutil.copy2(path, f"{path}.backup")
+                logger.info(f"Создана резервная копия шарда: {path}.backup")
+            except Exception as e:
+                logger.error(f"Ошибка при создании резервной копии: {e}")
+            return {}, ConnectionCodes()
+
+    def rebuild_shards(self):
+        self.shard_members = [set() for _ in range(self.shards)]
+        for owner_id in self.cats:
+            self.shard_members[cat_shard(owner_id, self.shards)].add(owner_id)
+
+    def record_shards(self, records: Iterable[dict]) -> Set[int]:
+        return {
+            cat_shard(record['id'], self.shards) if record['op'] in ('cat', 'del_cat')
+            else code_shard(record['id'], self.shards)
+            for record in records
+        }
+
+    def shards_data(self, indices: Iterable[int]) -> Dict[int, dict]:
+        """Содержимое указанных шардов: только их котики и их коды подключения."""
+        codes = self.connection_codes
+        return {
+            index: {
+                'cats': {
+                    str(owner_id): self.cats[owner_id].to_dict()
+                    for owner_id in self.shard_members[index]
+                    if owner_id in self.cats
+                },
+                'connection_codes': {
+                    code: (codes[code][0], codes[code][1].isoformat())
+                    for code in codes.shard_codes[index]
+                }
+            }
+            for index in indices
+        }
+
+    def append_records(self, records: list):
+        for index, data in self.shards_data(self.record_shards(records)).items():
+            write_json_atomic(self.shard_path(index), data)
+
+    def write_snapshot(self, data: dict):
+        for index, part in enumerate(split_snapshot(data, self.shards)):
+            write_json_atomic(self.shard_path(index), part)
+
+    def collect_changes(self) -> Optional[tuple]:
+        if not (self.dirty_cats or self.dirty_codes or self.snapshot_requested):
+            return None
+        if self.snapshot_requested:
+            indices = range(self.shards)
+        else:
+            indices = {cat_shard(owner_id, self.shards) for owner_id in self.dirty_cats}
+            indices |= {code_shard(code, self.shards) for code in self.dirty_codes}
+        # Содержимое затронутых шардов собираем здесь, в потоке цикла событий,
+        # а фоновый поток только пишет готовые данные
+        changes = 'shards', self.shards_data(indices)
+        self.dirty_cats = set()
+        self.dirty_codes = set()
+        self.snapshot_requested = False
+        self.pending_marks = 0
+        return changes
+
+    def write_payload(self, kind: str, payload):
+        if kind != 'shards':
+            super().write_payload(kind, payload)
+            return
+        for index, data in payload.items():
+            write_json_atomic(self.shard_path(index), data)
@@ -0,0 +1,199 @@
+import sqlite3
+import sys
+from collections import defaultdict
+from datetime import datetime
+from typing import List, Optional, Tuple
+
+from models import Storage, Cat, ConnectionCodes, StatDecay
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS cats (
+    owner_id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL,
+    color TEXT NOT NULL,
+    hunger INTEGER NOT NULL,
+    happiness INTEGER NOT NULL,
+    energy INTEGER NOT NULL,
+    created_at TEXT NOT NULL,
+    walk_time TEXT,
+    stats_updated_at REAL
+);
+CREATE INDEX IF NOT EXISTS idx_cats_walk_time ON cats(walk_time);
+
+CREATE TABLE IF NOT EXISTS connected_users (
+    owner_id INTEGER NOT NULL,
+    user_id INTEGER NOT NULL,
+    PRIMARY KEY (owner_id, user_id)
+);
+CREATE INDEX IF NOT EXISTS idx_connected_users_user ON connected_users(user_id);
+
+CREATE TABLE IF NOT EXISTS last_messages (
+    owner_id INTEGER NOT NULL,
+    user_id INTEGER NOT NULL,
+    sent_at TEXT NOT NULL,
+    PRIMARY KEY (owner_id, user_id)
+);
+
+CREATE TABLE IF NOT EXISTS connection_codes (
+    code TEXT PRIMARY KEY,
+    owner_id INTEGER NOT NULL,
+    expires_at TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_connection_codes_expires ON connection_codes(expires_at);
+"""
+
+CAT_COLUMNS = (
+    'owner_id', 'name', 'color', 'hunger', 'happiness', 'energy',
+    'created_at', 'walk_time', 'stats_updated_at'
+)
+
+UPSERT_CAT = (
+    f"INSERT INTO cats ({', '.join(CAT_COLUMNS)}) VALUES ({', '.join('?' * len(CAT_COLUMNS))}) "
+    "ON CONFLICT(owner_id) DO UPDATE SET "
+    + ', '.join(f"{column} = excluded.{column}" for column in CAT_COLUMNS[1:])
+)
+
+
+class SqliteStorage(Storage):
+    """Хранилище на SQLite с тем же интерфейсом, что и Storage.
+
+    Данные по-прежнему доступны в памяти через cats и connection_codes,
+    но каждое изменение записывается в базу отдельными строками,
+    а не перезаписью всего файла.
+    """
+
+    def __init__(self, file_path: str = 'data.db', write_behind: bool = False,
+                 flush_interval: float = 5.0, flush_after: int = 100,
+                 decay: Optional[StatDecay] = None):
+        self.connection = sqlite3.connect(file_path, check_same_thread=False)
+        self.connection.execute('PRAGMA journal_mode=WAL')
+        self.connection.execute('PRAGMA synchronous=NORMAL')
+        self.connection.executescript(SCHEMA)
+        self.migrate_schema()
+        # Изменения идут по тому же пути, что и записи журнала, только вместо
+        # дозаписи в файл каждая запись превращается в UPSERT одной строки
+        super().__init__(
+            file_path,
+            journal=True,
+            compact_every=sys.maxsize,
+            write_behind=write_behind,
+            flush_interval=flush_interval,
+            flush_after=flush_after,
+            decay=decay
+        )
+
+    def migrate_schema(self):
+        """Добавляет колонки, появившиеся в cats после создания базы."""
+        existing = {row[1] for row in self.connection.execute('PRAGMA table_info(cats)')}
+        if 'stats_updated_at' not in existing:
+            with self.connection:
+                self.connection.execute('ALTER TABLE cats ADD COLUMN stats_updated_at REAL')
+
+    def load(self):
+        connected = defaultdict(list)
+        for owner_id, user_id in self.connection.execute('SELECT owner_id, user_id FROM connected_users'):
+            connected[owner_id].append(user_id)
+
+        messages = defaultdict(dict)
+        for owner_id, user_id, sent_at in self.connection.execute(
+            'SELECT owner_id, user_id, sent_at FROM last_messages'
+        ):
+            messages[owner_id][str(user_id)] = sent_at
+
+        self.cats = {}
+        for row in self.connection.execute(f"SELECT {', '.join(CAT_COLUMNS)} FROM cats"):
+            data = dict(zip(CAT_COLUMNS, row))
+            data['connected_users'] = connected.get(data['owner_id'], [])
+            data['last_messages'] = messages.get(data['owner_id'], {})
+            self.cats[data['owner_id']] = Cat.from_dict(data)
+
+        self.connection_codes = ConnectionCodes({
+            code: (owner_id, datetime.fromisoformat(expires_at))
+            for code, owner_id, expires_at in self.connection.execute(
+                'SELECT code, owner_id, expires_at FROM connection_codes'
+            )
+        })
+        self.rebuild_index()
+
+    def apply_records(self, connection: sqlite3.Connection, records: List[dict]):
+        for record in records:
+            match record['op']:
+                case 'cat':
+                    data = record['data']
+                    owner_id = data['owner_id']
+                    connection.execute(UPSERT_CAT, [data[column] for column in CAT_COLUMNS])
+                    # Список подключенных пользователей записываем заново целиком,
+                    # чтобы отключение не оставляло в базе старых строк
+                    connection.execute('DELETE FROM connected_users WHERE owner_id = ?', (owner_id,))
+                    connection.executemany(
+                        'INSERT INTO connected_users (owner_id, user_id) VALUES (?, ?)',
+                        [(owner_id, user_id) for user_id in data['connected_users']]
+                    )
+                    # Время последнего сообщения только добавляется или обновляется
+                    connection.executemany(
+                        'INSERT OR REPLACE INTO last_messages (owner_id, user_id, sent_at) VALUES (?, ?, ?)',
+                        [(owner_id, int(user_id), sent_at) for user_id, sent_at in data['last_messages'].items()]
+                    )
+                case 'del_cat':
+                    for table in ('cats', 'connected_users', 'last_messages'):
+                        connection.execute(f'DELETE FROM {table} WHERE owner_id = ?', (record['id'],))
+                case 'code':
+                    owner_id, expires = record['data']
+                    connection.execute(
+                        'INSERT OR REPLACE INTO connection_codes (code, owner_id, expires_at) VALUES (?, ?, ?)',
+                        (record['id'], owner_id, expires)
+                    )
+                case 'del_code':
+                    connection.execute('DELETE FROM connection_codes WHERE code = ?', (record['id'],))
+
+    def append_records(self, records: list):
+        with self.connection:
+            self.apply_records(self.connection, records)
+
+    def write_snapshot(self, data: dict):
+        """Полностью заменяет содержимое базы одной транзакцией."""
+        records = [
+            {'op': 'cat', 'id': int(owner_id), 'data': cat_data}
+            for owner_id, cat_data in data['cats'].items()
+        ]
+        records += [
+            {'op': 'code', 'id': code, 'data': value}
+            for code, value in data['connection_codes'].items()
+        ]
+        with self.connection:
+            for table in ('cats', 'connected_users', 'last_messages', 'connection_codes'):
+                self.connection.execute(f'DELETE FROM {table}')
+            self.apply_records(self.connection, records)
+
+    def expired_codes(self, now: datetime) -> List[str]:
+        return [
+            code for (code,) in self.connection.execute(
+                'SELECT code FROM connection_codes WHERE expires_at < ?', (now.isoformat(),)
+            )
+        ]
+
+    def remove_expired_codes(self, now: datetime) -> List[str]:
+        # Истёкшие коды находим по индексу expires_at, а не перебором в памяти.
+        # Код мог быть уже использован или выдан заново, пока изменение ждёт
+        # фоновой записи, поэтому сверяемся с данными в памяти
+        expired = [
+            code for code in self.expired_codes(now)
+            if code in self.connection_codes and self.connection_codes[code][1] < now
+        ]
+        for code in expired:
+            del self.connection_codes[code]
+        self.save_codes(expired)
+        return expired
+
+    def walk_times(self, start: str = '00:00', end: str = '23:59') -> List[Tuple[int, str]]:
+        """Пары (владелец, время прогулки) для котиков со временем прогулки в промежутке [start, end].
+
+        Читается из базы по индексу walk_time, поэтому изменения, ещё ждущие
+        фоновой записи, в ответ не попадают.
+        """
+        return list(self.connection.execute(
+            'SELECT owner_id, walk_time FROM cats WHERE walk_time BETWEEN ? AND ?', (start, end)
+        ))
+
+    def close(self):
+        self.connection.close()
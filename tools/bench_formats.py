@@ -0,0 +1,75 @@
+"""Размер и время кодирования картинки статуса в разных форматах и размерах.
+
+Для каждого фона из resources/*.png рисуется карточка статуса во всех
+размерах из списка, и она кодируется во все форматы (PNG, JPEG, WebP).
+
+Запуск из корня проекта:
+    python -m tools.bench_formats --sizes 400 600 800 --quality 85
+"""
+import argparse
+import glob
+import json
+import os
+import statistics
+import time
+
+from image_generator import ImageGenerator
+
+
+def measure(generator: ImageGenerator, colors: list, repeat: int) -> dict:
+    # Карточка собирается сразу в нужном размере, замеряем только кодирование
+    images = [generator.draw_status_image(color, 'мурзик', 3, 2, 4, 42) for color in colors]
+    sizes = []
+    timings = []
+    for image in images:
+        for _ in range(repeat):
+            started = time.perf_counter()
+            data = generator.encode_image(image)
+            timings.append(time.perf_counter() - started)
+        sizes.append(len(data))
+    return {
+        'format': generator.image_format,
+        'size': generator.image_size,
+        'avg_kb': round(statistics.mean(sizes) / 1024, 1),
+        'avg_ms': round(statistics.mean(timings) * 1000, 1)
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Сравнение форматов картинок статуса')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[400, 600, 800])
+    parser.add_argument('--quality', type=int, default=85, help='Качество JPEG и WebP')
+    parser.add_argument('--png-compress-level', type=int, default=6)
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--json', help='Сохранить результаты в JSON-файл')
+    args = parser.parse_args()
+
+    base = ImageGenerator(cache_max_bytes=0)
+    colors = [
+        os.path.basename(path)[:-len('_cat.png')]
+        for path in sorted(glob.glob(os.path.join(base.resources_path, '*_cat.png')))
+    ]
+    print(f"Фоны: {', '.join(colors)}")
+
+    results = []
+    print(f"{'формат':<8} {'размер':>7} {'КБ':>10} {'мс':>10}")
+    for image_format in ImageGenerator.FORMATS:
+        for size in args.sizes:
+            generator = ImageGenerator(
+                cache_max_bytes=0,
+                png_compress_level=args.png_compress_level,
+                image_format=image_format,
+                image_quality=args.quality,
+                image_size=size
+            )
+            result = measure(generator, colors, args.repeat)
+            results.append(result)
+            print(f"{image_format:<8} {size:>7} {result['avg_kb']:>10.1f} {result['avg_ms']:>10.1f}")
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump({'quality': args.quality, 'results': results}, f, ensure_ascii=False, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,81 @@
+"""Время запуска и пиковая память при загрузке data.json.
+
+Сравнивает прежнюю загрузку (json.load всего файла) с потоковой загрузкой
+Storage. Каждый вариант запускается в отдельном процессе, чтобы пиковая
+память не смешивалась.
+
+Запуск из корня проекта:
+    python -m tools.bench_load --cats 200000
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+from models import Cat, Storage, peak_rss_mb
+
+
+def generate(file_path: str, count: int):
+    now = datetime.now()
+    with open(file_path, 'w', encoding='utf-8') as f:
+        f.write('{"cats": {')
+        for owner_id in range(count):
+            cat = Cat(owner_id, 'котик', 'серый', connected_users=[owner_id + 10 ** 9] if owner_id % 2 else [])
+            if owner_id % 3 == 0:
+                cat.set_last_message(owner_id, now.astimezone())
+            if owner_id:
+                f.write(',')
+            f.write(f'"{owner_id}": ')
+            json.dump(cat.to_dict(), f, ensure_ascii=False, indent=2)
+        f.write('}, "connection_codes": {')
+        f.write(', '.join(
+            f'"C{index:05d}": [{index}, "{(now + timedelta(hours=1)).isoformat()}"]'
+            for index in range(min(count, 1000))
+        ))
+        f.write('}}')
+
+
+def run_legacy(file_path: str) -> dict:
+    started = time.perf_counter()
+    with open(file_path, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+    cats = {int(owner_id): Cat.from_dict(cat_data) for owner_id, cat_data in data.get('cats', {}).items()}
+    return {'seconds': time.perf_counter() - started, 'cats': len(cats), 'peak_rss_mb': peak_rss_mb()}
+
+
+def run_streaming(file_path: str) -> dict:
+    storage = Storage(file_path)
+    return storage.load_stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Бенчмарк загрузки data.json')
+    parser.add_argument('--cats', type=int, default=200_000)
+    parser.add_argument('--mode', choices=('legacy', 'streaming'))
+    parser.add_argument('--file')
+    args = parser.parse_args()
+
+    if args.mode:
+        result = run_legacy(args.file) if args.mode == 'legacy' else run_streaming(args.file)
+        print(json.dumps(result))
+        return
+
+    with tempfile.TemporaryDirectory() as directory:
+        file_path = os.path.join(directory, 'data.json')
+        generate(file_path, args.cats)
+        print(f"Котиков: {args.cats}, размер файла: {os.path.getsize(file_path) / 1024 / 1024:.1f} МБ")
+        for mode in ('legacy', 'streaming'):
+            output = subprocess.run(
+                [sys.executable, '-m', 'tools.bench_load', '--mode', mode, '--file', file_path],
+                capture_output=True, text=True, check=True
+            ).stdout
+            result = json.loads(output.strip().splitlines()[-1])
+            print(f"{mode:<10} {result['seconds']:>7.2f} с  пиковая память {result['peak_rss_mb']:>8.1f} МБ")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,176 @@
+"""Бенчмарк отрисовки картинок статуса.
+
+Рисует карточки для всех цветов и всех 125 сочетаний характеристик на
+настоящих фонах из resources/ и шрифтах из fonts/, минуя кэш готовых
+картинок. Выводит задержку одной картинки (p50/p95), число картинок в
+секунду на одно ядро, среднее время каждого этапа и пиковую память.
+С --json результаты сохраняются в файл, чтобы сравнивать их между коммитами.
+
+Запуск из корня проекта:
+    python -m tools.bench_render --passes 2 --json render.json
+    python -m tools.bench_render --processes 4 --format jpeg --size 600
+"""
+import argparse
+import itertools
+import json
+import platform
+import statistics
+import subprocess
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import PIL
+
+from image_generator import ImageGenerator
+from models import peak_rss_mb
+
+STAT_VALUES = range(5)
+
+
+def percentile(values: list, fraction: float) -> float:
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(fraction * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def workload(generator: ImageGenerator, name: str) -> list:
+    """Все цвета и все сочетания характеристик; возраст меняется вместе с сочетанием."""
+    return [
+        (color, name, hunger, happiness, energy, age_days)
+        for color in generator.colors_trans
+        for age_days, (hunger, happiness, energy) in enumerate(
+            itertools.product(STAT_VALUES, STAT_VALUES, STAT_VALUES)
+        )
+    ]
+
+
+def run(settings: dict, passes: int, warmup: int, name: str) -> dict:
+    """Один процесс: запуск генератора и отрисовка всей нагрузки passes раз."""
+    started = time.perf_counter()
+    generator = ImageGenerator(cache_max_bytes=0, **settings)
+    startup = time.perf_counter() - started
+
+    renders = workload(generator, name)
+    for args in renders[:warmup]:
+        generator.encode_status(*args)
+    # Этапы запуска (open, resize, base) оставляем, этапы прогрева - нет
+    for stage in ('copy', 'bars', 'text', 'scale', 'encode'):
+        generator.timings[stage] = [0, 0.0]
+
+    latencies = []
+    sizes = []
+    loop_started = time.perf_counter()
+    for _ in range(passes):
+        for args in renders:
+            render_started = time.perf_counter()
+            data = generator.encode_status(*args)
+            latencies.append(time.perf_counter() - render_started)
+            sizes.append(len(data))
+    elapsed = time.perf_counter() - loop_started
+
+    return {
+        'startup_s': startup,
+        'elapsed_s': elapsed,
+        'latencies': latencies,
+        'avg_bytes': statistics.mean(sizes),
+        'stages': generator.timings,
+        'peak_rss_mb': peak_rss_mb()
+    }
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except Exception:
+        return ''
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Бенчмарк отрисовки картинок статуса')
+    parser.add_argument('--passes', type=int, default=1, help='Сколько раз рисовать всю нагрузку')
+    parser.add_argument('--warmup', type=int, default=8, help='Картинок для прогрева перед замером')
+    parser.add_argument('--processes', type=int, default=1, help='Параллельных процессов (каждый рисует всю нагрузку)')
+    parser.add_argument('--name', default='мурзик')
+    parser.add_argument('--format', default='png', choices=list(ImageGenerator.FORMATS))
+    parser.add_argument('--quality', type=int, default=85)
+    parser.add_argument('--size', type=int, default=800)
+    parser.add_argument('--png-compress-level', type=int, default=6)
+    parser.add_argument('--png-optimize', action='store_true')
+    parser.add_argument('--no-title-cache', action='store_true', help='Растеризовать заголовок на каждой картинке')
+    parser.add_argument('--json', help='Сохранить результаты в JSON-файл')
+    args = parser.parse_args()
+
+    settings = {
+        'png_compress_level': args.png_compress_level,
+        'png_optimize': args.png_optimize,
+        'image_format': args.format,
+        'image_quality': args.quality,
+        'image_size': args.size,
+        'title_cache_size': 0 if args.no_title_cache else 1024
+    }
+
+    wall_started = time.perf_counter()
+    if args.processes > 1:
+        with ProcessPoolExecutor(max_workers=args.processes) as pool:
+            futures = [
+                pool.submit(run, settings, args.passes, args.warmup, args.name)
+                for _ in range(args.processes)
+            ]
+            results = [future.result() for future in futures]
+    else:
+        results = [run(settings, args.passes, args.warmup, args.name)]
+    wall = time.perf_counter() - wall_started
+
+    latencies = [latency for result in results for latency in result['latencies']]
+    stages = {}
+    for result in results:
+        for stage, (count, total) in result['stages'].items():
+            merged = stages.setdefault(stage, [0, 0.0])
+            merged[0] += count
+            merged[1] += total
+    renders_per_core = statistics.mean(len(result['latencies']) / result['elapsed_s'] for result in results)
+
+    report = {
+        'commit': git_commit(),
+        'python': platform.python_version(),
+        'pillow': PIL.__version__,
+        'settings': settings,
+        'passes': args.passes,
+        'processes': args.processes,
+        'renders': len(latencies),
+        'avg_bytes': round(statistics.mean(result['avg_bytes'] for result in results)),
+        'startup_ms': round(statistics.mean(result['startup_s'] for result in results) * 1000, 1),
+        'latency_ms': {
+            'p50': round(percentile(latencies, 0.50) * 1000, 3),
+            'p95': round(percentile(latencies, 0.95) * 1000, 3),
+            'mean': round(statistics.mean(latencies) * 1000, 3),
+            'max': round(max(latencies) * 1000, 3)
+        },
+        'renders_per_sec_per_core': round(renders_per_core, 2),
+        'renders_per_sec_total': round(len(latencies) / wall, 2),
+        'stages_ms': {
+            stage: round(total / count * 1000, 3) if count else 0.0
+            for stage, (count, total) in stages.items()
+        },
+        'peak_rss_mb': round(max(result['peak_rss_mb'] for result in results), 1)
+    }
+
+    print(f"Картинок: {report['renders']} ({args.processes} проц.), формат {args.format} {args.size}px, "
+          f"в среднем {report['avg_bytes'] / 1024:.1f} КБ")
+    print(f"Запуск генератора: {report['startup_ms']} мс")
+    print(f"Задержка: p50 {report['latency_ms']['p50']} мс, p95 {report['latency_ms']['p95']} мс")
+    print(f"Картинок в секунду на ядро: {report['renders_per_sec_per_core']}, всего: {report['renders_per_sec_total']}")
+    print("Этапы (среднее, мс; open/resize/base - при запуске, на один цвет):")
+    for stage, value in report['stages_ms'].items():
+        print(f"  {stage:<8} {value:>10.3f}")
+    print(f"Пиковая память: {report['peak_rss_mb']} МБ")
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+
+
+if __name__ == '__main__':
+    main()
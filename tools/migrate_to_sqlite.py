@@ -0,0 +1,34 @@
+"""Перенос данных из data.json в базу SQLite.
+
+Запуск из корня проекта:
+    python -m tools.migrate_to_sqlite data.json data.db
+"""
+import argparse
+import time
+
+from models import Storage
+from sqlite_storage import SqliteStorage
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Импорт data.json в SQLite')
+    parser.add_argument('source', nargs='?', default='data.json')
+    parser.add_argument('target', nargs='?', default='data.db')
+    parser.add_argument('--journal', action='store_true', help='учесть журнал data.json.journal')
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    source = Storage(args.source, journal=args.journal)
+    target = SqliteStorage(args.target)
+    # Вся выгрузка идёт одной транзакцией через executemany
+    target.write_snapshot(source.to_dict())
+    target.close()
+
+    print(
+        f"Перенесено котиков: {len(source.cats)}, кодов подключения: {len(source.connection_codes)} "
+        f"за {time.perf_counter() - started:.2f} с"
+    )
+
+
+if __name__ == '__main__':
+    main()
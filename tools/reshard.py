@@ -0,0 +1,54 @@
+"""Перераскладка JSON-хранилища на другое число шардов.
+
+Число шардов 1 означает обычный единый файл data.json.
+Запуск из корня проекта:
+    python -m tools.reshard --from-shards 1 --to-shards 8 data.json
+"""
+import argparse
+import os
+
+from models import Storage, write_json_atomic
+from sharded_storage import ShardedStorage, read_shard_count, shard_path, split_snapshot, write_shard_count
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Перераскладка data.json по шардам')
+    parser.add_argument('path', nargs='?', default='data.json')
+    parser.add_argument('--from-shards', type=int, required=True)
+    parser.add_argument('--to-shards', type=int, required=True)
+    args = parser.parse_args()
+
+    if args.from_shards == args.to_shards:
+        print("Число шардов не меняется")
+        return
+    stored = read_shard_count(args.path)
+    if stored != args.from_shards:
+        print(f"Данные разложены на {stored} шард(ов), а не на {args.from_shards}")
+        return
+
+    source = Storage(args.path) if args.from_shards == 1 else ShardedStorage(args.path, shards=args.from_shards)
+    data = source.to_dict()
+
+    # Сначала полностью пишем новую раскладку, и только потом удаляем старую,
+    # чтобы при сбое посередине старые файлы остались целыми
+    if args.to_shards == 1:
+        write_json_atomic(args.path, data)
+    else:
+        for index, part in enumerate(split_snapshot(data, args.to_shards)):
+            write_json_atomic(shard_path(args.path, index, args.to_shards), part)
+    write_shard_count(args.path, args.to_shards)
+
+    if args.from_shards > 1:
+        for index in range(args.from_shards):
+            path = shard_path(args.path, index, args.from_shards)
+            if os.path.exists(path):
+                os.remove(path)
+
+    print(
+        f"Котиков: {len(source.cats)}, кодов подключения: {len(source.connection_codes)} "
+        f"разложено по {args.to_shards} шардам"
+    )
+
+
+if __name__ == '__main__':
+    main()